@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends, Request
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.db.session import get_db
+from app.db.session import get_db, mark_recent_writer
 from app.schemas.user import UserRegister, UserLogin, UserResponse, TokenResponse, RefreshRequest
 from app.services import auth_service
 from app.core.dependencies import get_current_user
@@ -13,7 +13,10 @@ router = APIRouter(prefix="/auth", tags=["auth"])
 
 @router.post("/register", response_model=UserResponse, status_code=201)
 async def register(data: UserRegister, db: AsyncSession = Depends(get_db)):
-    return await auth_service.register_user(data, db)
+    result = await auth_service.register_user(data, db)
+    # the new user has no token yet, so get_db cannot tell who wrote
+    await mark_recent_writer(result["user"]["id"])
+    return result
 
 @router.post("/login", response_model=TokenResponse)
 @limiter.limit("5/minute")
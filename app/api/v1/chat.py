@@ -1,98 +1,301 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, Query
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from app.db.session import AsyncSessionLocal
-from app.core.security import decode_token
-from app.models.user import User
-from app.models.message import Message
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query
+from app.db.session import AsyncSessionLocal, mark_recent_writer
+from app.core.user_cache import decode_access_token, load_user
+from app.services.message_cache import message_cache
+from app.services.message_writer import message_writer
 from app.websocket.manager import manager
-from app.redis.client import redis_client
-import json
+from app.websocket.rate_limit import frame_limiter
+from app.websocket.replay_log import replay_log
+from app.websocket.typing_state import typing_coalescer
+from app.services.presence_service import set_online, set_offline, set_room_offline
+from app.services.membership_service import is_member
+from app.core.config import settings
+import asyncio
+import logging
+import time
+import uuid
+from contextlib import asynccontextmanager
 from datetime import datetime, timezone
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(tags=["chat"])
 
+def _is_uuid(value: str) -> bool:
+    try:
+        uuid.UUID(value)
+        return True
+    except ValueError:
+        return False
+
 async def get_user_from_token(token: str):
-    payload = decode_token(token)
-    if not payload or payload.get("type") != "access":
+    user_id = decode_access_token(token)
+    if not user_id:
         return None
-    user_id = payload.get("sub")
-    async with AsyncSessionLocal() as db:
-        result = await db.execute(select(User).where(User.id == user_id))
-        return result.scalar_one_or_none()
+    return await load_user(user_id, AsyncSessionLocal)
+
+async def release_presence(user_id: str, room_ids, disconnected: bool = False):
+    # called after the socket is unsubscribed/disconnected; the user stays
+    # online (and in a room) while another of their sockets still is
+    if disconnected and not manager.is_connected(user_id):
+        await set_offline(user_id)
+    for room_id in room_ids:
+        if not manager.user_in_room(user_id, room_id):
+            await set_room_offline(user_id, room_id)
+
+# room_id → [lock, tasks holding or waiting for it]
+_broadcast_locks: dict[str, list] = {}
+
+@asynccontextmanager
+async def broadcast_lock(room_id: str):
+    entry = _broadcast_locks.setdefault(room_id, [asyncio.Lock(), 0])
+    entry[1] += 1
+    try:
+        async with entry[0]:
+            yield
+    finally:
+        entry[1] -= 1
+        if not entry[1]:
+            del _broadcast_locks[room_id]
+
+async def broadcast_event(message: dict, room_id: str):
+    # logged for replay first, so the frame goes out with its event_id. The
+    # append and the broadcast share a per-room lock: otherwise two events
+    # can be sent in the opposite order of their event_ids, and a client
+    # resuming from the later one would never get the earlier one.
+    async with broadcast_lock(room_id):
+        await manager.broadcast_to_room(await replay_log.append(room_id, message), room_id)
+
+async def resume_room(websocket: WebSocket, room_id: str, last_event_id: str):
+    # the socket is subscribed with hold=True, so nothing broadcast meanwhile
+    # can overtake the replay; if the gap is older than the log the client
+    # gets a "resync" frame and reloads history over REST instead
+    try:
+        events = await replay_log.since(room_id, last_event_id)
+    except Exception:
+        logger.exception("Failed to read replay log for room %s", room_id)
+        events = None
+    if events is None:
+        events = [{"type": "resync", "room_id": room_id}]
+    manager.release(websocket, room_id, events)
+
+async def join_room_channel(websocket: WebSocket, user, room_id: str, last_event_id: str | None = None):
+    if last_event_id:
+        manager.subscribe(websocket, room_id, hold=True)
+        await resume_room(websocket, room_id, str(last_event_id))
+    else:
+        manager.subscribe(websocket, room_id)
+
+    # set online presence in Redis (expires after PRESENCE_TTL without a refresh)
+    await set_online(str(user.id), user.username, room_id)
+
+    # broadcast join event
+    await broadcast_event({
+        "type": "user_joined",
+        "user_id": str(user.id),
+        "username": user.username,
+        "timestamp": datetime.now(timezone.utc).isoformat()
+    }, room_id)
+
+async def leave_room_channel(websocket: WebSocket, user, room_id: str):
+    manager.unsubscribe(websocket, room_id)
+    await typing_coalescer.clear(room_id, str(user.id))
+    await broadcast_event({
+        "type": "user_left",
+        "user_id": str(user.id),
+        "username": user.username,
+        "timestamp": datetime.now(timezone.utc).isoformat()
+    }, room_id)
+
+async def send_chat_message(user, room_id: str, content: str):
+    # queue for write-behind persistence; id and timestamp are
+    # generated here so the broadcast doesn't wait on the DB
+    message_id = uuid.uuid4()
+    created_at = datetime.now(timezone.utc)
+    await message_writer.enqueue({
+        "id": message_id,
+        "room_id": room_id,
+        "sender_id": user.id,
+        "content": content,
+        "created_at": created_at,
+    })
+    # the sender's own history reads go to the primary until replicas catch up
+    await mark_recent_writer(str(user.id))
+
+    # write through to the recent-messages cache, in history shape
+    await message_cache.push(room_id, {
+        "id": str(message_id),
+        "content": content,
+        "username": user.username,
+        "sender_id": str(user.id),
+        "room_id": room_id,
+        "timestamp": created_at.isoformat(),
+        "type": "text"
+    })
+
+    # a sent message ends the sender's typing state
+    await typing_coalescer.clear(room_id, str(user.id))
+
+    # broadcast to room
+    await broadcast_event({
+        "type": "message",
+        "message_id": str(message_id),
+        "room_id": room_id,
+        "sender_id": str(user.id),
+        "username": user.username,
+        "content": content,
+        "timestamp": created_at.isoformat()
+    }, room_id)
+
+async def send_typing(user, room_id: str, is_typing: bool):
+    # coalesced per room and sent as a "typing_state" frame
+    await typing_coalescer.update(room_id, str(user.id), user.username, is_typing)
+
+async def allow_frame(websocket: WebSocket, user, kind: str, room_id: str) -> bool:
+    # inbound flood protection for message and typing frames
+    if frame_limiter.allow(websocket, str(user.id), kind):
+        return True
+    if settings.WS_RATE_LIMIT_POLICY == "close":
+        await websocket.close(code=1008)
+        raise WebSocketDisconnect(code=1008)
+    if kind == "message":
+        manager.send_personal({"type": "error", "room_id": room_id, "detail": "Rate limit exceeded"}, websocket)
+    return False
 
 @router.websocket("/ws/{room_id}")
 async def websocket_endpoint(
     websocket: WebSocket,
     room_id: str,
-    token: str = Query(...)
+    token: str = Query(...),
+    last_event_id: str | None = Query(None),
 ):
+    # a reconnecting client passes the event_id of the last frame it got and
+    # is sent everything it missed before any new frame
     # authenticate user
     user = await get_user_from_token(token)
     if not user:
         await websocket.close(code=4001)
         return
 
+    # only room members may connect; answered from the Redis membership cache
+    if not _is_uuid(room_id) or not await is_member(room_id, str(user.id)):
+        await websocket.close(code=4003)
+        return
+    membership_checked_at = time.monotonic()
+
     # connect to room
-    await manager.connect(websocket, room_id, str(user.id), user.username)
+    await manager.register(websocket, str(user.id), user.username)
+    frame_limiter.add(websocket, str(user.id))
 
-    # set online presence in Redis (expires in 60 seconds)
-    await redis_client.setex(f"online:{user.id}", 60, user.username)
+    try:
+        await join_room_channel(websocket, user, room_id, last_event_id)
+        while True:
+            data = await websocket.receive_json()
+            manager.touch(websocket)
 
-    # broadcast join event
-    await manager.broadcast_to_room({
-        "type": "user_joined",
-        "user_id": str(user.id),
-        "username": user.username,
-        "timestamp": datetime.now(timezone.utc).isoformat()
-    }, room_id)
+            if data.get("type") == "ping":
+                manager.send_personal({"type": "pong"}, websocket)
+
+            elif data.get("type") == "message":
+                content = data.get("content", "").strip()
+                if not content or not await allow_frame(websocket, user, "message", room_id):
+                    continue
+
+                # re-check membership now and then so a user who left can't keep posting
+                if time.monotonic() - membership_checked_at > settings.MEMBERSHIP_RECHECK_INTERVAL:
+                    if not await is_member(room_id, str(user.id)):
+                        await websocket.close(code=4003)
+                        break
+                    membership_checked_at = time.monotonic()
+
+                await send_chat_message(user, room_id, content)
+
+            elif data.get("type") == "typing":
+                if await allow_frame(websocket, user, "typing", room_id):
+                    await send_typing(user, room_id, data.get("is_typing", False))
+
+    except WebSocketDisconnect:
+        pass
+    finally:
+        # whatever ended the loop (a malformed frame, a Redis error), the
+        # socket's indexes, writer task and buckets must not outlive it
+        manager.disconnect(websocket)
+        frame_limiter.discard(websocket, str(user.id))
+        await release_presence(str(user.id), [room_id], disconnected=True)
+        await leave_room_channel(websocket, user, room_id)
+
+@router.websocket("/ws")
+async def multiplexed_endpoint(websocket: WebSocket, token: str = Query(...)):
+    # one socket per user for any number of rooms. Client frames:
+    #   {"type": "subscribe" | "unsubscribe", "room_id": ..., "last_event_id"?: ...}
+    #   {"type": "message", "room_id": ..., "content": ...}
+    #   {"type": "typing", "room_id": ..., "is_typing": ...}
+    # every server frame carries the room_id it belongs to
+    user = await get_user_from_token(token)
+    if not user:
+        await websocket.close(code=4001)
+        return
+
+    await manager.register(websocket, str(user.id), user.username)
+    frame_limiter.add(websocket, str(user.id))
+
+    # room_id → when membership was last confirmed
+    subscriptions: dict[str, float] = {}
 
     try:
         while True:
             data = await websocket.receive_json()
+            manager.touch(websocket)
+            kind = data.get("type")
+            room_id = str(data.get("room_id", ""))
+
+            if kind == "ping":
+                manager.send_personal({"type": "pong"}, websocket)
+
+            elif kind == "subscribe":
+                if room_id in subscriptions:
+                    continue
+                if not _is_uuid(room_id) or not await is_member(room_id, str(user.id)):
+                    manager.send_personal({"type": "error", "room_id": room_id, "detail": "Not a member of this room"}, websocket)
+                    continue
+                subscriptions[room_id] = time.monotonic()
+                await join_room_channel(websocket, user, room_id, data.get("last_event_id"))
+
+            elif kind == "unsubscribe":
+                if subscriptions.pop(room_id, None) is not None:
+                    await leave_room_channel(websocket, user, room_id)
+                    await release_presence(str(user.id), [room_id])
+
+            elif kind in ("message", "typing"):
+                if room_id not in subscriptions:
+                    manager.send_personal({"type": "error", "room_id": room_id, "detail": "Not subscribed to this room"}, websocket)
+                    continue
+
+                if kind == "typing":
+                    if await allow_frame(websocket, user, "typing", room_id):
+                        await send_typing(user, room_id, data.get("is_typing", False))
+                    continue
 
-            if data.get("type") == "message":
                 content = data.get("content", "").strip()
-                if not content:
+                if not content or not await allow_frame(websocket, user, "message", room_id):
                     continue
 
-                # save to database
-                async with AsyncSessionLocal() as db:
-                    msg = Message(
-                        room_id=room_id,
-                        sender_id=user.id,
-                        content=content
-                    )
-                    db.add(msg)
-                    await db.commit()
-                    await db.refresh(msg)
-
-                # broadcast to room
-                await manager.broadcast_to_room({
-                    "type": "message",
-                    "message_id": str(msg.id),
-                    "room_id": room_id,
-                    "sender_id": str(user.id),
-                    "username": user.username,
-                    "content": content,
-                    "timestamp": msg.created_at.isoformat()
-                }, room_id)
+                if time.monotonic() - subscriptions[room_id] > settings.MEMBERSHIP_RECHECK_INTERVAL:
+                    if not await is_member(room_id, str(user.id)):
+                        del subscriptions[room_id]
+                        await leave_room_channel(websocket, user, room_id)
+                        await release_presence(str(user.id), [room_id])
+                        manager.send_personal({"type": "error", "room_id": room_id, "detail": "Not a member of this room"}, websocket)
+                        continue
+                    subscriptions[room_id] = time.monotonic()
 
-            elif data.get("type") == "typing":
-                # broadcast typing indicator
-                await manager.broadcast_to_room({
-                    "type": "typing",
-                    "username": user.username,
-                    "is_typing": data.get("is_typing", False)
-                }, room_id)
+                await send_chat_message(user, room_id, content)
 
     except WebSocketDisconnect:
-        manager.disconnect(websocket, room_id)
-        await redis_client.delete(f"online:{user.id}")
-
-        await manager.broadcast_to_room({
-            "type": "user_left",
-            "user_id": str(user.id),
-            "username": user.username,
-            "timestamp": datetime.now(timezone.utc).isoformat()
-        }, room_id)
\ No newline at end of file
+        pass
+    finally:
+        manager.disconnect(websocket)
+        frame_limiter.discard(websocket, str(user.id))
+        await release_presence(str(user.id), subscriptions, disconnected=True)
+        for room_id in subscriptions:
+            await leave_room_channel(websocket, user, room_id)
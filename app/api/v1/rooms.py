@@ -1,19 +1,33 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from datetime import datetime
+from typing import Optional
+from uuid import UUID
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.db.session import get_db
+from app.db.session import get_db, get_read_db
 from app.core.dependencies import get_current_user
 from app.models.user import User
 from app.schemas.room import RoomCreate, RoomLockVerify, DirectMessageCreate
 from app.services import room_service
+from app.services.export_service import export_room_messages, gzip_stream
+from app.services.membership_service import is_member
+from app.services.presence_service import get_room_online_users
+from app.services.unread_service import get_unread_counts, mark_read
 
 router = APIRouter(prefix="/rooms", tags=["Rooms"])
 
 
 @router.get("")
-async def list_rooms(db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def list_rooms(db: AsyncSession = Depends(get_read_db), current_user: User = Depends(get_current_user)):
     return await room_service.get_rooms(db)
 
 
+@router.get("/unread")
+async def unread_counts(db: AsyncSession = Depends(get_read_db), current_user: User = Depends(get_current_user)):
+    # room_id → unread messages, for every room the user belongs to
+    return await get_unread_counts(str(current_user.id), db)
+
+
 @router.post("")
 async def create_room(data: RoomCreate, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
     return await room_service.create_room(data, str(current_user.id), db)
@@ -37,9 +51,57 @@ async def leave_room(room_id: str, db: AsyncSession = Depends(get_db), current_u
     return {"success": True}
 
 
+@router.post("/{room_id}/read")
+async def mark_room_read(room_id: UUID, current_user: User = Depends(get_current_user)):
+    room_id = str(room_id)
+    if not await is_member(room_id, str(current_user.id)):
+        raise HTTPException(status_code=403, detail="Not a member of this room")
+    await mark_read(str(current_user.id), room_id)
+    return {"success": True}
+
+
 @router.get("/{room_id}/messages")
-async def get_messages(room_id: str, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
-    return await room_service.get_room_messages(room_id, db)
+async def get_messages(
+    room_id: str,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user),
+):
+    return await room_service.get_room_messages(room_id, db, limit=limit, before=before, after=after)
+
+
+@router.get("/{room_id}/export")
+async def export_messages(
+    room_id: UUID,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    gzip: bool = False,
+    current_user: User = Depends(get_current_user),
+):
+    # full history as NDJSON, oldest first, streamed from a server-side cursor
+    room_id = str(room_id)
+    if not await is_member(room_id, str(current_user.id)):
+        raise HTTPException(status_code=403, detail="Not a member of this room")
+    if since and until and since >= until:
+        raise HTTPException(status_code=400, detail="since must be before until")
+
+    body = export_room_messages(room_id, since, until)
+    filename = f"room-{room_id}.ndjson"
+    if gzip:
+        body = gzip_stream(body)
+        filename += ".gz"
+    return StreamingResponse(
+        body,
+        media_type="application/gzip" if gzip else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.get("/{room_id}/online")
+async def room_online_users(room_id: str, current_user: User = Depends(get_current_user)):
+    return await get_room_online_users(room_id)
 
 
 @router.post("/dm/start")
@@ -0,0 +1,25 @@
+from fastapi import APIRouter, Depends, Query
+from typing import Optional
+from uuid import UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.session import get_read_db
+from app.core.dependencies import get_current_user
+from app.models.user import User
+from app.services import search_service
+
+router = APIRouter(prefix="/search", tags=["Search"])
+
+
+@router.get("/messages")
+async def search_messages(
+    q: str = Query(..., min_length=1, max_length=200),
+    room_id: Optional[UUID] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=50),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user),
+):
+    # only rooms the caller is a member of are searched
+    return await search_service.search_messages(
+        str(current_user.id), q, db, limit=limit, room_id=room_id, cursor=cursor
+    )
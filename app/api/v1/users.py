@@ -1,6 +1,9 @@
 from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.dependencies import get_current_user
+from app.db.session import get_db
 from app.models.user import User
+from app.services import auth_service
 from app.services.presence_service import get_online_users, is_user_online
 from app.schemas.user import UserResponse
 
@@ -16,4 +19,8 @@ async def check_user_online(
     current_user: User = Depends(get_current_user)
 ):
     online = await is_user_online(user_id)
-    return {"user_id": user_id, "is_online": online}
\ No newline at end of file
+    return {"user_id": user_id, "is_online": online}
+
+@router.post("/me/deactivate", status_code=204)
+async def deactivate_me(db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
+    await auth_service.deactivate_user(str(current_user.id), db)
@@ -10,10 +10,90 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
 
+    # bcrypt thread pool; calls beyond workers + queue are rejected with 503
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_QUEUE: int = 64
+
+    # in-process token → user cache. Deactivating a user clears it on the
+    # worker that handled the request only; every other worker keeps
+    # accepting that user for up to AUTH_CACHE_TTL seconds
+    AUTH_CACHE_SIZE: int = 10000
+    AUTH_CACHE_TTL: int = 60
+
     DATABASE_URL: str
     SYNC_DATABASE_URL: str
 
+    # read-only endpoints use the replica when set; a user who wrote in the
+    # last READ_YOUR_WRITES_WINDOW seconds keeps reading from the primary
+    DATABASE_REPLICA_URL: Optional[str] = None
+    READ_YOUR_WRITES_WINDOW: int = 5
+
     REDIS_URL: str = "redis://localhost:6379"
+    PRESENCE_TTL: int = 60
+    MEMBERSHIP_CACHE_TTL: int = 3600
+    MEMBERSHIP_RECHECK_INTERVAL: int = 30
+
+    # ids of the public servers every new user joins, kept per process
+    PUBLIC_SERVER_CACHE_TTL: int = 300
+
+    # "local" keeps broadcasts inside this process, "redis" fans them out
+    # to every worker through Redis pub/sub
+    WS_BROADCAST_MODE: str = "local"
+    WS_CHANNEL_PREFIX: str = "ws:room:"
+
+    # per-socket outbound queue; "drop_oldest" or "disconnect" when it fills up
+    WS_SEND_QUEUE_SIZE: int = 256
+    WS_OVERFLOW_POLICY: str = "drop_oldest"
+
+    # server pings every interval; sockets silent for longer than the timeout are reaped
+    WS_HEARTBEAT_INTERVAL: float = 20
+    WS_HEARTBEAT_TIMEOUT: float = 60
+
+    # typing indicators: one "typing_state" frame per room at most every
+    # interval; a typer is dropped TTL seconds after their last typing event
+    WS_TYPING_INTERVAL_MS: int = 300
+    WS_TYPING_TTL: float = 6
+
+    # per-room replay log (Redis Stream) of the last N events, used to resume
+    # reconnecting sockets; 0 disables it. Idle rooms' logs expire after the TTL
+    WS_REPLAY_MAXLEN: int = 1000
+    WS_REPLAY_TTL: int = 86400
+
+    # inbound token buckets (frames per second, burst) per socket and per user;
+    # an over-limit frame is dropped ("throttle") or the socket closed ("close")
+    WS_MESSAGE_RATE: float = 5
+    WS_MESSAGE_BURST: int = 10
+    WS_TYPING_RATE: float = 5
+    WS_TYPING_BURST: int = 10
+    WS_USER_MESSAGE_RATE: float = 10
+    WS_USER_MESSAGE_BURST: int = 20
+    WS_USER_TYPING_RATE: float = 10
+    WS_USER_TYPING_BURST: int = 20
+    WS_RATE_LIMIT_POLICY: str = "throttle"
+
+    # write-behind message persistence
+    MESSAGE_BATCH_SIZE: int = 100
+    MESSAGE_FLUSH_INTERVAL_MS: int = 10
+    MESSAGE_QUEUE_SIZE: int = 10000
+
+    # monthly partitions of messages: how many future months exist ahead of
+    # time, and after how many months old ones are detached into the archive
+    # schema (0 keeps everything attached)
+    MESSAGE_PARTITION_MONTHS_AHEAD: int = 3
+    MESSAGE_PARTITION_RETENTION_MONTHS: int = 0
+    MESSAGE_ARCHIVE_SCHEMA: str = "archive"
+
+    # Redis hot-tail of the newest messages per room
+    MESSAGE_CACHE_SIZE: int = 200
+    MESSAGE_CACHE_TTL: int = 300
+
+    # rooms count their new messages in Redis and a Celery beat task turns
+    # them into one notification per offline member every interval
+    NOTIFICATION_DIGEST_INTERVAL: int = 900
+
+    # unread counters live in Redis; read watermarks are written back to
+    # room_members.last_read_at in one batch every interval
+    READ_WATERMARK_FLUSH_INTERVAL: int = 30
 
     SMTP_HOST: str = "smtp.gmail.com"
     SMTP_PORT: int = 587
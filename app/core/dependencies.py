@@ -1,26 +1,22 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from app.db.session import get_db
-from app.core.security import decode_token
-from app.models.user import User
+from app.db.session import get_read_session_opener
+from app.core.user_cache import CachedUser, decode_access_token, load_user
 
 bearer_scheme = HTTPBearer()
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
-    db: AsyncSession = Depends(get_db)
-) -> User:
+    open_session=Depends(get_read_session_opener),
+) -> CachedUser:
     token = credentials.credentials
-    payload = decode_token(token)
+    user_id = decode_access_token(token)
 
-    if not payload or payload.get("type") != "access":
+    if not user_id:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
 
-    user_id = payload.get("sub")
-    result = await db.execute(select(User).where(User.id == user_id))
-    user = result.scalar_one_or_none()
+    # served from the in-process cache; only a miss opens a session
+    user = await load_user(user_id, open_session)
 
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
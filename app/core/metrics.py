@@ -0,0 +1,119 @@
+from prometheus_client import Counter, Gauge, Histogram, REGISTRY
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, HistogramMetricFamily
+
+# latency buckets tuned for in-process work (sub-millisecond) up to slow DB calls
+FAST_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route",
+    ["method", "route", "status"],
+)
+BROADCAST_LATENCY = Histogram(
+    "ws_broadcast_duration_seconds",
+    "Time to encode and enqueue one room broadcast, including the Redis publish",
+    buckets=FAST_BUCKETS,
+)
+BROADCAST_FANOUT = Histogram(
+    "ws_broadcast_fanout_sockets",
+    "Local sockets reached by one broadcast",
+    buckets=(1, 5, 10, 50, 100, 500, 1000, 5000, 10000),
+)
+MESSAGE_PERSIST_LATENCY = Histogram(
+    "message_persist_duration_seconds",
+    "Time to bulk-insert one batch of chat messages",
+    buckets=FAST_BUCKETS,
+)
+MESSAGE_PERSIST_BATCH = Histogram(
+    "message_persist_batch_size",
+    "Rows per message insert batch",
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000),
+)
+MESSAGES_PERSISTED = Counter("messages_persisted", "Chat messages written to Postgres")
+MESSAGES_DROPPED = Counter("messages_persist_failed", "Chat messages given up on after retries")
+MESSAGES_REJECTED = Counter("messages_rejected", "Chat messages Postgres refused outright (constraint, missing partition)")
+MESSAGE_CACHE_REQUESTS = Counter(
+    "message_cache_requests",
+    "Recent-messages cache lookups by result",
+    ["result"],
+)
+REDIS_LATENCY = Histogram(
+    "redis_command_duration_seconds",
+    "Redis call latency by command (pipelines are one call)",
+    ["command"],
+    buckets=FAST_BUCKETS,
+)
+WS_RATE_LIMITED = Counter(
+    "ws_rate_limited_frames",
+    "Inbound WebSocket frames over their token bucket",
+    ["kind", "scope"],
+)
+PASSWORD_HASH_QUEUE = Gauge(
+    "password_hash_queue_depth",
+    "bcrypt calls waiting for a free worker thread",
+)
+
+
+ROOM_SIZE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+
+class RuntimeCollector:
+    # reads live state at scrape time instead of mirroring it on every change
+    def __init__(self, manager, engines: dict, password_hasher):
+        # engines: label → sync Engine, e.g. {"primary": ..., "replica": ...}
+        self.manager = manager
+        self.engines = engines
+        self.password_hasher = password_hasher
+
+    def collect(self):
+        sockets = GaugeMetricFamily("ws_active_sockets", "Open WebSockets on this worker")
+        sockets.add_metric([], len(self.manager.connections))
+        yield sockets
+
+        if self.manager.redis is not None:
+            # 0 means broadcasts from other workers don't reach this one
+            listener = GaugeMetricFamily("ws_pubsub_connected", "Whether the cross-worker pub/sub listener is subscribed")
+            listener.add_metric([], int(self.manager.listener_connected))
+            yield listener
+            reconnects = CounterMetricFamily("ws_pubsub_reconnects", "Times the pub/sub listener had to resubscribe")
+            reconnects.add_metric([], self.manager.listener_reconnects)
+            yield reconnects
+
+        # a distribution, not a series per room: room ids are unbounded
+        sizes = [len(conns) for conns in self.manager.active_connections.values()]
+        buckets = [(str(bound), sum(1 for size in sizes if size <= bound)) for bound in ROOM_SIZE_BUCKETS]
+        buckets.append(("+Inf", len(sizes)))
+        yield HistogramMetricFamily(
+            "ws_room_sockets",
+            "Open WebSockets per active room on this worker",
+            buckets=buckets,
+            sum_value=sum(sizes),
+        )
+
+        for name, value, doc in (
+            ("ws_dropped_frames", self.manager.dropped_frames, "Frames dropped on full send queues"),
+            ("ws_slow_consumer_disconnects", self.manager.slow_consumer_disconnects, "Sockets closed for not keeping up"),
+            ("ws_reaped_connections", self.manager.reaped_connections, "Sockets closed by the heartbeat"),
+            ("password_hash_rejected", self.password_hasher.rejected, "bcrypt calls rejected with 503"),
+        ):
+            counter = CounterMetricFamily(name, doc)
+            counter.add_metric([], value)
+            yield counter
+
+        for name, stat, doc in (
+            ("db_pool_checked_out", lambda pool: pool.checkedout(), "DB connections currently checked out"),
+            ("db_pool_overflow", lambda pool: pool.overflow(), "DB connections open beyond pool_size"),
+            ("db_pool_size", lambda pool: pool.size(), "Configured DB pool size"),
+        ):
+            gauge = GaugeMetricFamily(name, doc, labels=["engine"])
+            for label, engine in self.engines.items():
+                gauge.add_metric([label], stat(engine.pool))
+            yield gauge
+
+
+def register_runtime_metrics(manager, engines: dict, password_hasher):
+    # engines: label → AsyncEngine
+    REGISTRY.register(RuntimeCollector(
+        manager, {label: engine.sync_engine for label, engine in engines.items()}, password_hasher,
+    ))
+    PASSWORD_HASH_QUEUE.set_function(lambda: password_hasher.queue_depth)
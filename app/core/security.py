@@ -1,15 +1,45 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
+from fastapi import HTTPException
 from jose import jwt, JWTError
 from passlib.context import CryptContext
 from app.core.config import settings
+import asyncio
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+class PasswordHasher:
+    # bcrypt takes 100ms+ of CPU per call, so it runs on a small thread pool
+    # (bcrypt releases the GIL) instead of blocking the event loop
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self.pending = 0
+        self.rejected = 0
 
-def verify_password(plain: str, hashed: str) -> bool:
-    return pwd_context.verify(plain, hashed)
+    @property
+    def queue_depth(self) -> int:
+        # calls waiting for a free worker
+        return max(0, self.pending - self.workers)
+
+    async def run(self, fn, *args):
+        if self.pending >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise HTTPException(status_code=503, detail="Server busy, try again shortly")
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+        finally:
+            self.pending -= 1
+
+password_hasher = PasswordHasher(settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_MAX_QUEUE)
+
+async def hash_password(password: str) -> str:
+    return await password_hasher.run(pwd_context.hash, password)
+
+async def verify_password(plain: str, hashed: str) -> bool:
+    return await password_hasher.run(pwd_context.verify, plain, hashed)
 
 def create_access_token(data: dict) -> str:
     to_encode = data.copy()
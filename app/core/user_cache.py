@@ -0,0 +1,98 @@
+from collections import OrderedDict
+from sqlalchemy import select
+from app.core.config import settings
+from app.core.security import decode_token
+from app.models.user import User
+import time
+
+class TTLCache:
+    # bounded LRU with a per-entry expiry; process-local, not shared between workers
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value, ttl: float | None = None):
+        if self.maxsize <= 0:
+            return
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+
+class CachedUser:
+    # the fields request handlers read off the current user, without an ORM session
+    __slots__ = ("id", "username", "email", "is_active", "created_at")
+
+    def __init__(self, id, username, email, is_active, created_at):
+        self.id = id
+        self.username = username
+        self.email = email
+        self.is_active = is_active
+        self.created_at = created_at
+
+    @classmethod
+    def from_user(cls, user: User) -> "CachedUser":
+        return cls(user.id, user.username, user.email, user.is_active, user.created_at)
+
+
+# token → user_id and user_id → CachedUser
+token_cache = TTLCache(settings.AUTH_CACHE_SIZE, settings.AUTH_CACHE_TTL)
+user_cache = TTLCache(settings.AUTH_CACHE_SIZE, settings.AUTH_CACHE_TTL)
+
+def decode_access_token(token: str) -> str | None:
+    user_id = token_cache.get(token)
+    if user_id is not None:
+        return user_id
+
+    payload = decode_token(token)
+    if not payload or payload.get("type") != "access":
+        return None
+    user_id = payload.get("sub")
+    # never keep a token around past its own expiry
+    token_cache.set(token, user_id, ttl=payload["exp"] - time.time())
+    return user_id
+
+async def load_user(user_id: str, open_session) -> CachedUser | None:
+    # `open_session()` gives an async session context, entered only on a miss
+    user = user_cache.get(user_id)
+    if user is not None:
+        return user
+
+    async with open_session() as db:
+        result = await db.execute(select(User).where(User.id == user_id))
+        row = result.scalar_one_or_none()
+    if not row:
+        return None
+    user = CachedUser.from_user(row)
+    user_cache.set(user_id, user)
+    return user
+
+def invalidate_user(user_id: str):
+    # call whenever a user is deactivated or their profile changes; only this
+    # process forgets the user, other workers catch up within AUTH_CACHE_TTL
+    user_cache.pop(str(user_id))
@@ -0,0 +1,40 @@
+"""add messages room_id created_at index
+
+Revision ID: 3f2a9c71d4e8
+Revises: 8bcceaa6a898
+Create Date: 2026-10-18 10:12:44.318205
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f2a9c71d4e8'
+down_revision: Union[str, None] = '8bcceaa6a898'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # built concurrently so a large messages table isn't write-locked
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_messages_room_created',
+            'messages',
+            ['room_id', 'created_at', 'id'],
+            unique=False,
+            postgresql_where=sa.text('is_deleted = false'),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_messages_room_created',
+            table_name='messages',
+            postgresql_concurrently=True,
+        )
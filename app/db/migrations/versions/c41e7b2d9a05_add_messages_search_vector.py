@@ -0,0 +1,57 @@
+"""add messages search_vector and GIN index
+
+Revision ID: c41e7b2d9a05
+Revises: 3f2a9c71d4e8
+Create Date: 2026-10-18 14:02:17.530114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c41e7b2d9a05'
+down_revision: Union[str, None] = '3f2a9c71d4e8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # lets the GIN index cover the room_id filter as well as the text
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gin')
+
+    # a stored generated column is computed for every existing row, which
+    # rewrites the table once; run this in a maintenance window on big tables
+    op.add_column(
+        'messages',
+        sa.Column(
+            'search_vector',
+            postgresql.TSVECTOR(),
+            sa.Computed("to_tsvector('english', content)", persisted=True),
+            nullable=True,
+        ),
+    )
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_messages_search',
+            'messages',
+            ['room_id', 'search_vector'],
+            unique=False,
+            postgresql_using='gin',
+            postgresql_where=sa.text('is_deleted = false'),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_messages_search',
+            table_name='messages',
+            postgresql_concurrently=True,
+        )
+    op.drop_column('messages', 'search_vector')
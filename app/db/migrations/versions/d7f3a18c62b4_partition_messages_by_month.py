@@ -0,0 +1,113 @@
+"""partition messages by month of created_at
+
+Revision ID: d7f3a18c62b4
+Revises: c41e7b2d9a05
+Create Date: 2026-10-18 16:40:03.118472
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7f3a18c62b4'
+down_revision: Union[str, None] = 'c41e7b2d9a05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# future months created up front; app.tasks.partitions keeps the window moving
+MONTHS_AHEAD = 3
+
+COLUMNS = 'id, room_id, sender_id, content, message_type, is_deleted, created_at'
+
+
+def _create_messages(partitioned: bool) -> None:
+    op.create_table('messages',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('room_id', sa.UUID(), nullable=False),
+    sa.Column('sender_id', sa.UUID(), nullable=False),
+    sa.Column('content', sa.String(), nullable=False),
+    sa.Column('message_type', postgresql.ENUM('text', 'system', name='messagetype', create_type=False), nullable=True),
+    sa.Column('is_deleted', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('search_vector', postgresql.TSVECTOR(), sa.Computed("to_tsvector('english', content)", persisted=True), nullable=True),
+    sa.ForeignKeyConstraint(['room_id'], ['rooms.id'], ),
+    sa.ForeignKeyConstraint(['sender_id'], ['users.id'], ),
+    # a partitioned table's primary key must contain the partition key
+    sa.PrimaryKeyConstraint('id', 'created_at') if partitioned else sa.PrimaryKeyConstraint('id'),
+    **({'postgresql_partition_by': 'RANGE (created_at)'} if partitioned else {}),
+    )
+
+
+def _create_indexes() -> None:
+    op.create_index(
+        'ix_messages_room_created',
+        'messages',
+        ['room_id', 'created_at', 'id'],
+        unique=False,
+        postgresql_where=sa.text('is_deleted = false'),
+    )
+    op.create_index(
+        'ix_messages_search',
+        'messages',
+        ['room_id', 'search_vector'],
+        unique=False,
+        postgresql_using='gin',
+        postgresql_where=sa.text('is_deleted = false'),
+    )
+
+
+def _set_aside_old_table(new_name: str) -> None:
+    op.rename_table('messages', new_name)
+    op.execute(f'ALTER TABLE {new_name} RENAME CONSTRAINT messages_pkey TO {new_name}_pkey')
+    op.execute(f'ALTER INDEX ix_messages_room_created RENAME TO ix_{new_name}_room_created')
+    op.execute(f'ALTER INDEX ix_messages_search RENAME TO ix_{new_name}_search')
+
+
+def upgrade() -> None:
+    # Copies every row into the new table in one transaction. Writes to
+    # messages are blocked until it commits; run it in a maintenance window.
+    op.execute("SET LOCAL TIME ZONE 'UTC'")
+    _set_aside_old_table('messages_unpartitioned')
+    _create_messages(partitioned=True)
+
+    # one partition per month, from the oldest message up to MONTHS_AHEAD
+    # months from now, named messages_YYYY_MM
+    op.execute(f"""
+        DO $$
+        DECLARE
+            month timestamptz := date_trunc('month', COALESCE((SELECT min(created_at) FROM messages_unpartitioned), now()));
+            last_month timestamptz := date_trunc('month', now()) + interval '{MONTHS_AHEAD} months';
+        BEGIN
+            WHILE month <= last_month LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF messages FOR VALUES FROM (%L) TO (%L)',
+                    'messages_' || to_char(month, 'YYYY_MM'), month, month + interval '1 month'
+                );
+                month := month + interval '1 month';
+            END LOOP;
+        END $$;
+    """)
+
+    op.execute(f"""
+        INSERT INTO messages ({COLUMNS})
+        SELECT id, room_id, sender_id, content, message_type, is_deleted, COALESCE(created_at, now())
+        FROM messages_unpartitioned
+    """)
+    op.drop_table('messages_unpartitioned')
+
+    # built once on the parent after the copy; new partitions inherit them
+    _create_indexes()
+
+
+def downgrade() -> None:
+    _set_aside_old_table('messages_partitioned')
+    _create_messages(partitioned=False)
+    op.execute(f'INSERT INTO messages ({COLUMNS}) SELECT {COLUMNS} FROM messages_partitioned')
+    # drops every partition with it; archived partitions are left alone
+    op.drop_table('messages_partitioned')
+    op.alter_column('messages', 'created_at', existing_type=sa.DateTime(timezone=True), nullable=True)
+    _create_indexes()
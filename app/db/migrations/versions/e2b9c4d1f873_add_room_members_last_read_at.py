@@ -0,0 +1,27 @@
+"""add room_members last_read_at
+
+Revision ID: e2b9c4d1f873
+Revises: d7f3a18c62b4
+Create Date: 2026-10-18 17:41:09.284615
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2b9c4d1f873'
+down_revision: Union[str, None] = 'd7f3a18c62b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # nullable without a default, so this is a catalog-only change
+    op.add_column('room_members', sa.Column('last_read_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('room_members', 'last_read_at')
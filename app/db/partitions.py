@@ -0,0 +1,56 @@
+from sqlalchemy import text
+from datetime import date, datetime, timezone
+
+# messages is range-partitioned by created_at, one partition per UTC month:
+#   messages_2026_10  FOR VALUES FROM ('2026-10-01 00:00+00') TO ('2026-11-01 00:00+00')
+PARENT = "messages"
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+def add_months(month: date, n: int) -> date:
+    index = month.year * 12 + month.month - 1 + n
+    return date(index // 12, index % 12 + 1, 1)
+
+def partition_name(month: date) -> str:
+    return f"{PARENT}_{month:%Y_%m}"
+
+def partition_month(name: str) -> date | None:
+    # inverse of partition_name; None for anything that isn't a monthly partition
+    try:
+        year, month = name.removeprefix(f"{PARENT}_").split("_")
+        return date(int(year), int(month), 1)
+    except ValueError:
+        return None
+
+def create_partition_sql(month: date) -> str:
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF {PARENT} "
+        f"FOR VALUES FROM ('{month.isoformat()} 00:00+00') TO ('{add_months(month, 1).isoformat()} 00:00+00')"
+    )
+
+def list_partitions(connection) -> list[str]:
+    return list(connection.execute(text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE parent.relname = :parent"
+    ), {"parent": PARENT}).scalars())
+
+def ensure_partitions(connection, first: date, last: date):
+    # every month from first to last, both included
+    month = month_start(first)
+    while month <= last:
+        connection.execute(text(create_partition_sql(month)))
+        month = add_months(month, 1)
+
+def ensure_current_partitions(connection, months_ahead: int, today: date | None = None):
+    # run at app startup as well as by the daily task, so a deployment without
+    # Celery beat still gets its partitions; inserts into a month without one
+    # fail, so refuse to start rather than drop messages later
+    this_month = month_start(today or datetime.now(timezone.utc).date())
+    # workers starting together would otherwise race on CREATE TABLE
+    connection.execute(text("SELECT pg_advisory_xact_lock(hashtext(:parent))"), {"parent": PARENT})
+    ensure_partitions(connection, this_month, add_months(this_month, months_ahead))
+    if partition_name(this_month) not in list_partitions(connection):
+        raise RuntimeError(f"{PARENT} has no partition for {this_month:%Y-%m}")
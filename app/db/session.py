@@ -1,22 +1,100 @@
+from contextlib import asynccontextmanager
+from fastapi import Request
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+from sqlalchemy.orm import Session
 from app.core.config import settings
+from app.core.user_cache import decode_access_token
+from app.redis.client import redis_client
 
 engine = create_async_engine(
     settings.DATABASE_URL,
     echo=settings.DEBUG,  # logs all SQL — useful during dev
 )
 
+# without a replica every read simply goes to the primary
+replica_engine = create_async_engine(
+    settings.DATABASE_REPLICA_URL,
+    echo=settings.DEBUG,
+) if settings.DATABASE_REPLICA_URL else engine
+
 AsyncSessionLocal = async_sessionmaker(
     engine,
     class_=AsyncSession,
     expire_on_commit=False
 )
 
-async def get_db():
+ReplicaSessionLocal = async_sessionmaker(
+    replica_engine,
+    class_=AsyncSession,
+    expire_on_commit=False
+)
+
+# ── read-your-writes ─────────────────────────────────────────────────────
+# A request that commits a write on the primary marks its user in Redis for
+# READ_YOUR_WRITES_WINDOW seconds (shared by all workers); that user's reads
+# stay on the primary until the mark expires and the replica has caught up.
+
+RECENT_WRITER_PREFIX = "recent_writer:"
+
+@event.listens_for(Session, "after_flush")
+def _flag_flush(session, flush_context):
+    session.info["wrote"] = True
+
+@event.listens_for(Session, "do_orm_execute")
+def _flag_dml(state):
+    if state.is_insert or state.is_update or state.is_delete:
+        state.session.info["wrote"] = True
+
+def request_user_id(request: Request) -> str | None:
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    return decode_access_token(token)
+
+async def mark_recent_writer(user_id: str):
+    if replica_engine is engine:
+        return
+    await redis_client.set(
+        f"{RECENT_WRITER_PREFIX}{user_id}", 1, ex=settings.READ_YOUR_WRITES_WINDOW
+    )
+
+async def read_session_factory(request: Request) -> async_sessionmaker:
+    if replica_engine is engine:
+        return AsyncSessionLocal
+    user_id = request_user_id(request)
+    if user_id and await redis_client.exists(f"{RECENT_WRITER_PREFIX}{user_id}"):
+        return AsyncSessionLocal
+    return ReplicaSessionLocal
+
+async def get_db(request: Request):
+    # primary; use for every endpoint that may write
     async with AsyncSessionLocal() as session:
         try:
             yield session
             await session.commit()
         except Exception:
             await session.rollback()
-            raise
\ No newline at end of file
+            raise
+        wrote = session.info.get("wrote", False)
+
+    user_id = request_user_id(request) if wrote else None
+    if user_id:
+        await mark_recent_writer(user_id)
+
+@asynccontextmanager
+async def read_session(request: Request):
+    factory = await read_session_factory(request)
+    async with factory() as session:
+        yield session
+
+async def get_read_db(request: Request):
+    # read-only endpoints; nothing is committed
+    async with read_session(request) as session:
+        yield session
+
+async def get_read_session_opener(request: Request):
+    # for dependencies that rarely query: a callable that opens a read
+    # session, so the routing (a Redis lookup when a replica is set) and the
+    # session only happen when a query actually runs
+    return lambda: read_session(request)
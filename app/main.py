@@ -1,25 +1,42 @@
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+import time
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import HTMLResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 from app.core.config import settings
 from app.core.exceptions import validation_exception_handler, global_exception_handler
-from app.api.v1 import auth, rooms, chat, users, invites
-from app.db.session import AsyncSessionLocal
+from app.api.v1 import auth, rooms, chat, users, invites, search
+from app.db.partitions import ensure_current_partitions
+from app.db.session import AsyncSessionLocal, engine, replica_engine
+from app.core.metrics import HTTP_LATENCY, register_runtime_metrics
+from app.core.security import password_hasher
 from app.services.room_service import create_public_servers
+from app.services.message_writer import message_writer
+from app.websocket.manager import manager
+from app.websocket.typing_state import typing_coalescer
 
 limiter = Limiter(key_func=get_remote_address)
 
 # ✅ lifespan defined BEFORE app
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    async with engine.begin() as conn:
+        await conn.run_sync(ensure_current_partitions, settings.MESSAGE_PARTITION_MONTHS_AHEAD)
     async with AsyncSessionLocal() as db:
         await create_public_servers(db)
+    await manager.start()
+    await message_writer.start()
+    await typing_coalescer.start()
     yield
+    await typing_coalescer.stop()
+    # flush queued messages before the process exits
+    await message_writer.stop()
+    await manager.stop()
 
 # ✅ app created ONCE with lifespan
 app = FastAPI(
@@ -38,6 +55,31 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+register_runtime_metrics(
+    manager,
+    {"primary": engine} if replica_engine is engine else {"primary": engine, "replica": replica_engine},
+    password_hasher,
+)
+
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    start = time.perf_counter()
+    # an exception escaping the handler becomes a 500 further out, and must
+    # still be counted
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        # label by route template, not the raw path, to keep cardinality bounded
+        route = request.scope.get("route")
+        HTTP_LATENCY.labels(
+            request.method,
+            route.path if route else "unmatched",
+            status_code,
+        ).observe(time.perf_counter() - start)
+
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 app.add_exception_handler(RequestValidationError, validation_exception_handler)
@@ -49,6 +91,7 @@ app.include_router(rooms.router, prefix="/api/v1")
 app.include_router(users.router, prefix="/api/v1")
 app.include_router(chat.router)
 app.include_router(invites.router, prefix="/api/v1")
+app.include_router(search.router, prefix="/api/v1")
 
 
 @app.get("/", response_class=HTMLResponse, include_in_schema=False)
@@ -356,8 +399,18 @@ async def landing():
     """
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
 @app.get("/health")
-async def health():
+async def health(response: Response):
+    # a worker whose pub/sub listener is down still serves its own sockets
+    # but misses every broadcast from the others
+    if manager.redis is not None and not manager.listener_connected:
+        response.status_code = 503
+        return {"status": "degraded", "app": settings.APP_NAME, "version": "1.0.0", "pubsub": "disconnected"}
     return {
         "status": "ok",
         "app": settings.APP_NAME,
@@ -1,9 +1,11 @@
 import uuid
-from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Enum
-from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Enum, Index, Computed, DDL, event, text
+from sqlalchemy.dialects.postgresql import TSVECTOR, UUID
+from sqlalchemy.orm import deferred, relationship
 from datetime import datetime, timezone
+from app.core.config import settings
 from app.db.base import Base
+from app.db.partitions import add_months, ensure_partitions, month_start
 import enum
 
 class MessageType(str, enum.Enum):
@@ -19,7 +21,50 @@ class Message(Base):
     content = Column(String, nullable=False)
     message_type = Column(Enum(MessageType), default=MessageType.text)
     is_deleted = Column(Boolean, default=False)
-    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    # partition key, so it is part of the primary key (see __table_args__)
+    created_at = Column(
+        DateTime(timezone=True),
+        primary_key=True,
+        nullable=False,
+        default=lambda: datetime.now(timezone.utc),
+    )
+    # maintained by Postgres; deferred so history queries don't load it
+    search_vector = deferred(Column(
+        TSVECTOR,
+        Computed("to_tsvector('english', content)", persisted=True),
+    ))
+
+    __table_args__ = (
+        # keyset pagination of room history
+        Index(
+            "ix_messages_room_created",
+            "room_id", "created_at", "id",
+            postgresql_where=text("is_deleted = false"),
+        ),
+        # full-text search; btree_gin lets one GIN index filter by room and text
+        Index(
+            "ix_messages_search",
+            "room_id", "search_vector",
+            postgresql_using="gin",
+            postgresql_where=text("is_deleted = false"),
+        ),
+        # one partition per month, created ahead of time at app startup and
+        # by app.tasks.partitions.maintain_message_partitions
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
 
     room = relationship("Room", back_populates="messages")
-    sender = relationship("User", back_populates="messages")
\ No newline at end of file
+    sender = relationship("User", back_populates="messages")
+
+event.listen(Message.__table__, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS btree_gin"))
+
+@event.listens_for(Message.__table__, "after_create")
+def _create_partitions(target, connection, **kw):
+    # databases built from metadata (tests, local dev) start with the same
+    # window of monthly partitions the migration and maintenance task keep
+    this_month = month_start(datetime.now(timezone.utc).date())
+    ensure_partitions(
+        connection,
+        add_months(this_month, -1),
+        add_months(this_month, settings.MESSAGE_PARTITION_MONTHS_AHEAD),
+    )
@@ -35,6 +35,8 @@ class RoomMember(Base):
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), primary_key=True)
     role = Column(Enum(RoomRole), default=RoomRole.member)
     joined_at = Column(DateTime(timezone=True), server_default=func.now())
+    # read watermark, flushed in batches from Redis (see unread_service)
+    last_read_at = Column(DateTime(timezone=True), nullable=True)
 
     room = relationship("Room", back_populates="members")
     user = relationship("User", back_populates="room_memberships")
\ No newline at end of file
@@ -1,4 +1,29 @@
 import redis.asyncio as redis
+from redis.asyncio.client import Pipeline
 from app.core.config import settings
+from app.core.metrics import REDIS_LATENCY
+import time
 
-redis_client = redis.from_url(settings.REDIS_URL, decode_responses=True)
\ No newline at end of file
+class InstrumentedPipeline(Pipeline):
+    async def execute(self, raise_on_error: bool = True):
+        start = time.perf_counter()
+        try:
+            return await super().execute(raise_on_error)
+        finally:
+            REDIS_LATENCY.labels("pipeline").observe(time.perf_counter() - start)
+
+class InstrumentedRedis(redis.Redis):
+    # times every command and pipeline round-trip for /metrics
+    async def execute_command(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        finally:
+            REDIS_LATENCY.labels(str(args[0]).lower()).observe(time.perf_counter() - start)
+
+    def pipeline(self, transaction: bool = True, shard_hint=None) -> Pipeline:
+        return InstrumentedPipeline(
+            self.connection_pool, self.response_callbacks, transaction, shard_hint
+        )
+
+redis_client = InstrumentedRedis.from_url(settings.REDIS_URL, decode_responses=True)
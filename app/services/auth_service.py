@@ -1,58 +1,79 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import insert, literal, select, true, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
 from app.models.user import User
 from app.models.room import Room, RoomMember, RoomRole
 from app.schemas.user import UserRegister
 from app.core.security import hash_password, verify_password, create_access_token, create_refresh_token
+from app.core.user_cache import invalidate_user
+from app.services import membership_service
+from app.services.room_service import get_public_server_ids
 from fastapi import HTTPException
+from datetime import datetime, timezone
+import uuid
 
 
 async def register_user(data: UserRegister, db: AsyncSession):
-    result = await db.execute(
-        select(User).where((User.email == data.email) | (User.username == data.username))
-    )
-    if result.scalar_one_or_none():
-        raise HTTPException(status_code=400, detail="Email or username already exists")
-
-    user = User(
-        username=data.username,
-        email=data.email,
-        hashed_password=hash_password(data.password),
-    )
-    db.add(user)
-    await db.flush()
+    public_server_ids = await get_public_server_ids(db)
+    hashed_password = await hash_password(data.password)
 
-    # Auto join all public servers
-    public_rooms = await db.execute(
-        select(Room).where(Room.is_public_server == True)
+    # one statement creates the user and joins every public server:
+    #   WITH new_user AS (INSERT INTO users ... RETURNING id)
+    #   INSERT INTO room_members SELECT ... FROM rooms JOIN new_user ... ON CONFLICT DO NOTHING
+    # rooms is still joined so that a stale cached id can never produce a dangling row
+    # Python column defaults are not applied to DML inside a CTE, nor to the
+    # INSERT that selects from it, so every defaulted column is bound here
+    user_id = uuid.uuid4()
+    new_user = (
+        insert(User)
+        .values(
+            id=user_id,
+            username=data.username,
+            email=data.email,
+            hashed_password=hashed_password,
+            is_active=True,
+            created_at=datetime.now(timezone.utc),
+        )
+        .returning(User.id)
+        .cte("new_user")
     )
-    for room in public_rooms.scalars().all():
-        existing = await db.execute(
-            select(RoomMember).where(
-                RoomMember.room_id == room.id,
-                RoomMember.user_id == user.id
-            )
+    auto_join = (
+        pg_insert(RoomMember)
+        .from_select(
+            ["room_id", "user_id", "role"],
+            select(Room.id, new_user.c.id, literal(RoomRole.member, RoomMember.role.type))
+            .join(new_user, true())
+            .where(Room.id.in_(public_server_ids)),
         )
-        if not existing.scalar_one_or_none():
-            db.add(RoomMember(room_id=room.id, user_id=user.id, role=RoomRole.member))
+        .on_conflict_do_nothing()
+        .returning(RoomMember.room_id)
+    )
+    try:
+        result = await db.execute(auto_join)
+        joined = result.scalars().all()
+        await db.commit()
+    except IntegrityError:
+        # unique username/email, checked by Postgres instead of a SELECT up front
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Email or username already exists")
 
-    await db.commit()
-    await db.refresh(user)
+    await membership_service.add_to_rooms(user_id, joined)
 
-    access_token = create_access_token({"sub": str(user.id)})
-    refresh_token = create_refresh_token({"sub": str(user.id)})
+    access_token = create_access_token({"sub": str(user_id)})
+    refresh_token = create_refresh_token({"sub": str(user_id)})
 
     return {
         "access_token": access_token,
         "refresh_token": refresh_token,
-        "user": {"id": str(user.id), "username": user.username, "email": user.email}
+        "user": {"id": str(user_id), "username": data.username, "email": data.email}
     }
 
 
 async def login_user(email: str, password: str, db: AsyncSession):
     result = await db.execute(select(User).where(User.email == email))
     user = result.scalar_one_or_none()
-    if not user or not verify_password(password, user.hashed_password):
+    if not user or not await verify_password(password, user.hashed_password):
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
     access_token = create_access_token({"sub": str(user.id)})
@@ -62,4 +83,12 @@ async def login_user(email: str, password: str, db: AsyncSession):
         "access_token": access_token,
         "refresh_token": refresh_token,
         "user": {"id": str(user.id), "username": user.username, "email": user.email}
-    }
\ No newline at end of file
+    }
+
+
+async def deactivate_user(user_id: str, db: AsyncSession):
+    await db.execute(update(User).where(User.id == user_id).values(is_active=False))
+    await db.commit()
+    # takes effect on this worker at once; the user cache is per process, so
+    # other workers accept the user until their copy expires (AUTH_CACHE_TTL)
+    invalidate_user(user_id)
@@ -0,0 +1,70 @@
+from sqlalchemy import select
+from app.db.session import ReplicaSessionLocal
+from app.models.message import Message
+from app.models.user import User
+from datetime import datetime
+from typing import AsyncIterator
+import orjson
+import zlib
+
+# rows fetched per round-trip from the server-side cursor; also the size of
+# one chunk handed to the response, so memory stays flat however big the room
+EXPORT_BATCH_SIZE = 1000
+
+
+def build_export_query(room_id: str, since: datetime | None = None, until: datetime | None = None):
+    # oldest first; (room_id, created_at, id) is covered by ix_messages_room_created
+    query = (
+        select(
+            Message.id,
+            Message.sender_id,
+            User.username,
+            Message.content,
+            Message.message_type,
+            Message.created_at,
+        )
+        .join(User, Message.sender_id == User.id)
+        .where(Message.room_id == room_id, Message.is_deleted == False)
+    )
+    if since is not None:
+        query = query.where(Message.created_at >= since)
+    if until is not None:
+        query = query.where(Message.created_at < until)
+    return query.order_by(Message.created_at.asc(), Message.id.asc())
+
+
+async def export_room_messages(
+    room_id: str,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    session_factory=ReplicaSessionLocal,
+    batch_size: int = EXPORT_BATCH_SIZE,
+) -> AsyncIterator[bytes]:
+    # yields NDJSON, one chunk per batch. The session is opened here rather
+    # than taken from a dependency because the response outlives the handler.
+    query = build_export_query(room_id, since, until).execution_options(yield_per=batch_size)
+    async with session_factory() as db:
+        result = await db.stream(query)
+        async for rows in result.partitions():
+            yield b"".join(
+                orjson.dumps({
+                    "id": str(message_id),
+                    "room_id": room_id,
+                    "sender_id": str(sender_id),
+                    "username": username,
+                    "content": content,
+                    "type": message_type.value if message_type else "text",
+                    "timestamp": created_at.isoformat() if created_at else None,
+                }) + b"\n"
+                for message_id, sender_id, username, content, message_type, created_at in rows
+            )
+
+
+async def gzip_stream(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    # gzip framing (wbits=31), compressed chunk by chunk as the rows arrive
+    compressor = zlib.compressobj(wbits=31)
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -2,6 +2,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from app.models.invite import RoomInvite
 from app.models.room import Room, RoomMember, RoomRole
+from app.services import membership_service
 from fastapi import HTTPException
 from datetime import datetime, timedelta, timezone
 import secrets
@@ -49,6 +50,7 @@ async def use_invite(code: str, user_id: str, db: AsyncSession):
     if not existing.scalar_one_or_none():
         db.add(RoomMember(room_id=invite.room_id, user_id=user_id, role=RoomRole.member))
         await db.commit()
+        await membership_service.add_member(invite.room_id, user_id)
 
     room = await db.execute(select(Room).where(Room.id == invite.room_id))
     return room.scalar_one()
\ No newline at end of file
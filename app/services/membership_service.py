@@ -0,0 +1,73 @@
+from redis.exceptions import WatchError
+from sqlalchemy import select
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.room import RoomMember
+from app.redis.client import redis_client
+
+# room_members mirrored into one Redis set per room. A set is only trusted
+# once it holds the LOADED marker, which is added together with the full
+# member list from Postgres; writes made to a cold set are harmless because
+# the next check reloads it anyway. Every removal bumps the room's version,
+# and a load only writes if the version did not move while it read Postgres,
+# so a member removed meanwhile is never added back.
+LOADED = "__loaded__"
+LOAD_ATTEMPTS = 3
+
+def members_key(room_id: str) -> str:
+    return f"members:{room_id}"
+
+def version_key(room_id: str) -> str:
+    return f"members:{room_id}:version"
+
+async def _load(room_id: str) -> set[str]:
+    key, version = members_key(room_id), version_key(room_id)
+    for _ in range(LOAD_ATTEMPTS):
+        seen = await redis_client.get(version)
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(RoomMember.user_id).where(RoomMember.room_id == room_id)
+            )
+            members = {str(user_id) for user_id in result.scalars().all()}
+
+        async with redis_client.pipeline(transaction=True) as pipe:
+            try:
+                await pipe.watch(version)
+                if await pipe.get(version) != seen:
+                    # a removal landed during the read; it is committed by
+                    # now, so the next read sees it
+                    continue
+                pipe.multi()
+                pipe.sadd(key, LOADED, *members)
+                pipe.expire(key, settings.MEMBERSHIP_CACHE_TTL)
+                await pipe.execute()
+                return members
+            except WatchError:
+                continue
+    # left uncached; the read itself started after the last removal
+    return members
+
+async def is_member(room_id: str, user_id: str) -> bool:
+    is_member, loaded = await redis_client.smismember(members_key(room_id), [user_id, LOADED])
+    if loaded:
+        return bool(is_member)
+    return user_id in await _load(room_id)
+
+async def add_member(room_id: str, user_id: str):
+    await redis_client.sadd(members_key(str(room_id)), str(user_id))
+
+async def add_to_rooms(user_id: str, room_ids: list):
+    if not room_ids:
+        return
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for room_id in room_ids:
+            pipe.sadd(members_key(str(room_id)), str(user_id))
+        await pipe.execute()
+
+async def remove_member(room_id: str, user_id: str):
+    # called after the DB delete is committed
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.srem(members_key(str(room_id)), str(user_id))
+        pipe.incr(version_key(str(room_id)))
+        pipe.expire(version_key(str(room_id)), settings.MEMBERSHIP_CACHE_TTL)
+        await pipe.execute()
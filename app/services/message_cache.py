@@ -0,0 +1,129 @@
+from redis.exceptions import WatchError
+from app.core.config import settings
+from app.core.metrics import MESSAGE_CACHE_REQUESTS
+from app.redis.client import redis_client
+from datetime import datetime
+import orjson
+
+def newest_first(messages: list[dict]) -> list[dict]:
+    # history order, (timestamp, id) descending, each message once
+    seen = set()
+    ordered = []
+    for message in sorted(messages, key=lambda m: (datetime.fromisoformat(m["timestamp"]), m["id"]), reverse=True):
+        if message["id"] not in seen:
+            seen.add(message["id"])
+            ordered.append(message)
+    return ordered
+
+class MessageCache:
+    # capped per-room list of the newest serialized messages. Every send is
+    # pushed, cached room or not, so nothing sent while a room is cold is
+    # lost: the writer may not have flushed it yet and the replica may lag,
+    # so Postgres alone can't be trusted for the newest rows. A list is only
+    # served once a fill has merged it with the history from Postgres, which
+    # `{key}:full` marks. Pushes from several workers can land out of order
+    # and overlap with a fill, so reads sort and dedupe.
+    def __init__(self, redis, size: int = 200, ttl: int = 300, prefix: str = "recent:", max_attempts: int = 5):
+        self.redis = redis
+        self.size = size
+        self.ttl = ttl
+        self.prefix = prefix
+        self.max_attempts = max_attempts
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, room_id: str) -> str:
+        return f"{self.prefix}{room_id}"
+
+    def _full_key(self, room_id: str) -> str:
+        return f"{self.prefix}{room_id}:full"
+
+    async def get(self, room_id: str, count: int) -> list[dict] | None:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.exists(self._full_key(room_id))
+            pipe.lrange(self._key(room_id), 0, -1)
+            full, frames = await pipe.execute()
+        if not full or not frames:
+            self.misses += 1
+            MESSAGE_CACHE_REQUESTS.labels("miss").inc()
+            return None
+        self.hits += 1
+        MESSAGE_CACHE_REQUESTS.labels("hit").inc()
+        return newest_first([orjson.loads(frame) for frame in frames])[:count]
+
+    async def fill(self, room_id: str, messages: list[dict]) -> list[dict]:
+        # merges the page read from Postgres with whatever was pushed, and
+        # returns the merged list. A push landing between the read and the
+        # write aborts the transaction and the merge is redone, so a fill
+        # never overwrites a newer message.
+        key = self._key(room_id)
+        merged = newest_first(messages)[:self.size]
+        async with self.redis.pipeline(transaction=True) as pipe:
+            for _ in range(self.max_attempts):
+                try:
+                    await pipe.watch(key)
+                    pushed = [orjson.loads(frame) for frame in await pipe.lrange(key, 0, -1)]
+                    merged = newest_first(pushed + messages)[:self.size]
+                    if not merged:
+                        return merged
+                    pipe.multi()
+                    pipe.delete(key)
+                    pipe.rpush(key, *(orjson.dumps(m) for m in merged))
+                    pipe.expire(key, self.ttl)
+                    pipe.set(self._full_key(room_id), 1, ex=self.ttl)
+                    await pipe.execute()
+                    return merged
+                except WatchError:
+                    continue
+        # a room this busy stays cold for now; the next read tries again
+        return merged
+
+    async def push(self, room_id: str, message: dict):
+        key = self._key(room_id)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.lpush(key, orjson.dumps(message))
+            pipe.ltrim(key, 0, self.size - 1)
+            pipe.expire(key, self.ttl)
+            pipe.expire(self._full_key(room_id), self.ttl)
+            await pipe.execute()
+
+    async def discard(self, rows: list[dict]):
+        # message writer hook for rows that never reached Postgres: they were
+        # pushed (and broadcast) ahead of persistence and must not stay cached
+        rooms: dict[str, set[str]] = {}
+        for row in rows:
+            rooms.setdefault(str(row["room_id"]), set()).add(str(row["id"]))
+        for room_id, message_ids in rooms.items():
+            await self._discard(room_id, message_ids)
+
+    async def _discard(self, room_id: str, message_ids: set[str]):
+        key = self._key(room_id)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            for _ in range(self.max_attempts):
+                try:
+                    await pipe.watch(key)
+                    frames = await pipe.lrange(key, 0, -1)
+                    kept = [frame for frame in frames if orjson.loads(frame)["id"] not in message_ids]
+                    if len(kept) == len(frames):
+                        return
+                    pipe.multi()
+                    pipe.delete(key)
+                    if kept:
+                        pipe.rpush(key, *kept)
+                        pipe.expire(key, self.ttl)
+                    await pipe.execute()
+                    return
+                except WatchError:
+                    continue
+        # never leave an unpersisted message in the cache
+        await self.invalidate(room_id)
+
+    async def invalidate(self, room_id: str):
+        # called when a message is deleted or edited; the next read refills
+        await self.redis.delete(self._key(room_id), self._full_key(room_id))
+
+message_cache = MessageCache(
+    redis_client,
+    size=settings.MESSAGE_CACHE_SIZE,
+    ttl=settings.MESSAGE_CACHE_TTL,
+)
@@ -0,0 +1,161 @@
+from sqlalchemy import insert
+from sqlalchemy.exc import DataError, IntegrityError
+from app.core.config import settings
+from app.core.metrics import (
+    MESSAGE_PERSIST_BATCH, MESSAGE_PERSIST_LATENCY, MESSAGES_DROPPED, MESSAGES_PERSISTED, MESSAGES_REJECTED,
+)
+from app.db.session import AsyncSessionLocal
+from app.models.message import Message
+from app.services.message_cache import message_cache
+from app.services.notification_service import record_missed_messages
+from app.services.unread_service import record_persisted
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+class MessageWriter:
+    # write-behind persistence for chat messages: the socket loop enqueues
+    # rows with app-generated id/created_at and a single writer task
+    # bulk-inserts them every `flush_interval` seconds or `batch_size` rows
+    def __init__(
+        self,
+        session_factory=AsyncSessionLocal,
+        batch_size: int = 100,
+        flush_interval: float = 0.01,
+        max_queue_size: int = 10000,
+        max_retries: int = 3,
+        on_persisted=(),
+        on_failed=(),
+    ):
+        # every `on_persisted` hook gets each batch once it is committed
+        # (unread counters, offline digests); every `on_failed` hook gets the
+        # rows that were rejected or dropped, which were broadcast and cached
+        # ahead of persistence and never will be
+        self.session_factory = session_factory
+        self.on_persisted = on_persisted
+        self.on_failed = on_failed
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue_size)
+        self._task: asyncio.Task | None = None
+        self._closing = False
+        self.inserted = 0
+        self.failed = 0
+        self.rejected = 0
+
+    async def start(self):
+        if self._task is None:
+            self._closing = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        # stop accepting new rows and flush everything still queued
+        if self._task is None:
+            return
+        self._closing = True
+        await self._task
+        self._task = None
+
+    async def enqueue(self, row: dict):
+        if self._closing:
+            raise RuntimeError("Message writer is shutting down")
+        # blocks when the queue is full, pushing back on the socket loop
+        await self.queue.put(row)
+
+    async def _run(self):
+        while not (self._closing and self.queue.empty()):
+            batch = await self._collect()
+            if batch:
+                await self._flush(batch)
+
+    async def _collect(self) -> list[dict]:
+        try:
+            first = await asyncio.wait_for(self.queue.get(), timeout=self.flush_interval)
+        except asyncio.TimeoutError:
+            return []
+        batch = [first]
+        deadline = asyncio.get_running_loop().time() + self.flush_interval
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0 or self._closing:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _flush(self, batch: list[dict]):
+        MESSAGE_PERSIST_BATCH.observe(len(batch))
+        persisted = await self._insert(batch)
+        failed = []
+        if len(persisted) < len(batch):
+            persisted_ids = {row["id"] for row in persisted}
+            failed = [row for row in batch if row["id"] not in persisted_ids]
+
+        # outside the retry loop: a failing hook must not insert the batch twice
+        await self._run_hooks(self.on_persisted, persisted)
+        await self._run_hooks(self.on_failed, failed)
+
+    async def _run_hooks(self, hooks, rows: list[dict]):
+        if not rows:
+            return
+        for hook in hooks:
+            try:
+                await hook(rows)
+            except Exception:
+                logger.exception("Message writer hook %s failed for %d messages", hook.__name__, len(rows))
+
+    async def _insert(self, batch: list[dict]) -> list[dict]:
+        # returns the rows that made it into Postgres
+        for attempt in range(1, self.max_retries + 1):
+            start = time.perf_counter()
+            try:
+                async with self.session_factory() as db:
+                    # executemany with RETURNING is sent as one multi-row INSERT
+                    result = await db.execute(
+                        insert(Message).returning(Message.id), batch
+                    )
+                    inserted = len(result.all())
+                    await db.commit()
+                MESSAGE_PERSIST_LATENCY.observe(time.perf_counter() - start)
+                MESSAGES_PERSISTED.inc(inserted)
+                self.inserted += inserted
+                return batch
+            except (IntegrityError, DataError):
+                # one bad row (dangling FK, no partition for its created_at)
+                # fails the whole statement and retrying can't fix it, so
+                # split the batch until only the offending rows are left out
+                if len(batch) == 1:
+                    logger.exception("Rejected message %s", batch[0].get("id"))
+                    MESSAGES_REJECTED.inc()
+                    self.rejected += 1
+                    return []
+                middle = len(batch) // 2
+                return await self._insert(batch[:middle]) + await self._insert(batch[middle:])
+            except Exception:
+                logger.exception(
+                    "Failed to persist %d messages (attempt %d/%d)",
+                    len(batch), attempt, self.max_retries,
+                )
+                await asyncio.sleep(0.1 * attempt)
+        MESSAGES_DROPPED.inc(len(batch))
+        self.failed += len(batch)
+        logger.error("Dropped %d messages after %d attempts", len(batch), self.max_retries)
+        return []
+
+message_writer = MessageWriter(
+    batch_size=settings.MESSAGE_BATCH_SIZE,
+    flush_interval=settings.MESSAGE_FLUSH_INTERVAL_MS / 1000,
+    max_queue_size=settings.MESSAGE_QUEUE_SIZE,
+    on_persisted=(record_persisted, record_missed_messages),
+    on_failed=(message_cache.discard,),
+)
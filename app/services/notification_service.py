@@ -0,0 +1,38 @@
+from app.core.config import settings
+from app.redis.client import redis_client
+import time
+
+# Missed messages are not sent one by one, and nothing per member happens
+# when they are persisted. Each committed batch only bumps its rooms in
+#   digest:rooms  room_id → messages persisted since the last digest run
+#   digest:last   room_id → "sender_id|preview" of the newest of them
+# and a periodic Celery task drains both, works out which members are
+# offline and how many of those messages each has not read (see
+# app.tasks.notifications), and sends every such user one notification.
+ROOMS_KEY = "digest:rooms"
+LAST_KEY = "digest:last"
+PREVIEW_LENGTH = 100
+
+async def record_missed_messages(rows: list[dict]):
+    # message writer hook, once per committed batch: one counter and one
+    # "last" entry per room, however many members the room has
+    counts: dict[str, int] = {}
+    last: dict[str, str] = {}
+    for row in rows:
+        room_id = str(row["room_id"])
+        counts[room_id] = counts.get(room_id, 0) + 1
+        last[room_id] = f"{row['sender_id']}|{row['content'][:PREVIEW_LENGTH]}"
+
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for room_id, count in counts.items():
+            pipe.hincrby(ROOMS_KEY, room_id, count)
+        pipe.hset(LAST_KEY, mapping=last)
+        await pipe.execute()
+
+def parse_last(value: str | None) -> tuple[str, str]:
+    # → (sender_id, preview)
+    sender_id, _, preview = (value or "|").partition("|")
+    return sender_id, preview
+
+def is_stale(last_seen: float | None) -> bool:
+    return last_seen is None or last_seen < time.time() - settings.PRESENCE_TTL
@@ -1,23 +1,84 @@
+from app.core.config import settings
 from app.redis.client import redis_client
+import time
 
-async def set_online(user_id: str, username: str):
-    await redis_client.setex(f"online:{user_id}", 60, username)
+# presence lives in sorted sets scored by last-seen time, so "who is online"
+# is a range query instead of a KEYS scan; usernames sit in one hash
+ONLINE_KEY = "presence:online"
+USERNAMES_KEY = "presence:usernames"
 
-async def set_offline(user_id: str):
-    await redis_client.delete(f"online:{user_id}")
+def _room_key(room_id: str) -> str:
+    return f"presence:room:{room_id}"
+
+async def set_online(user_id: str, username: str, room_id: str | None = None):
+    now = time.time()
+    async with redis_client.pipeline(transaction=False) as pipe:
+        pipe.zadd(ONLINE_KEY, {user_id: now})
+        pipe.hset(USERNAMES_KEY, user_id, username)
+        if room_id:
+            pipe.zadd(_room_key(room_id), {user_id: now})
+        await pipe.execute()
+
+async def set_offline(user_id: str, room_id: str | None = None):
+    async with redis_client.pipeline(transaction=False) as pipe:
+        pipe.zrem(ONLINE_KEY, user_id)
+        pipe.hdel(USERNAMES_KEY, user_id)
+        if room_id:
+            pipe.zrem(_room_key(room_id), user_id)
+        await pipe.execute()
+
+async def set_room_offline(user_id: str, room_id: str):
+    await redis_client.zrem(_room_key(room_id), user_id)
+
+async def _online_in(key: str) -> list:
+    cutoff = time.time() - settings.PRESENCE_TTL
+    async with redis_client.pipeline(transaction=False) as pipe:
+        pipe.zrangebyscore(key, "-inf", f"({cutoff}")
+        pipe.zremrangebyscore(key, "-inf", f"({cutoff}")
+        pipe.zrangebyscore(key, cutoff, "+inf")
+        expired, _, user_ids = await pipe.execute()
+
+    # drop usernames of users that timed out, and resolve the live ones
+    drop_usernames = key == ONLINE_KEY and bool(expired)
+    if not (drop_usernames or user_ids):
+        return []
+    async with redis_client.pipeline(transaction=False) as pipe:
+        if drop_usernames:
+            pipe.hdel(USERNAMES_KEY, *expired)
+        if user_ids:
+            pipe.hmget(USERNAMES_KEY, user_ids)
+        results = await pipe.execute()
+
+    usernames = results[-1] if user_ids else []
+    return [
+        {"user_id": user_id, "username": username}
+        for user_id, username in zip(user_ids, usernames)
+        if username is not None
+    ]
 
 async def get_online_users() -> list:
-    keys = await redis_client.keys("online:*")
-    online = []
-    for key in keys:
-        username = await redis_client.get(key)
-        user_id = key.replace("online:", "")
-        online.append({"user_id": user_id, "username": username})
-    return online
+    return await _online_in(ONLINE_KEY)
+
+async def get_room_online_users(room_id: str) -> list:
+    return await _online_in(_room_key(room_id))
 
 async def is_user_online(user_id: str) -> bool:
-    return await redis_client.exists(f"online:{user_id}") == 1
+    last_seen = await redis_client.zscore(ONLINE_KEY, user_id)
+    return last_seen is not None and last_seen >= time.time() - settings.PRESENCE_TTL
 
-async def refresh_presence(user_id: str):
-    # reset TTL — called on heartbeat
-    await redis_client.expire(f"online:{user_id}", 60)
\ No newline at end of file
+async def refresh_presence_many(entries: list[tuple[str, str, str]]):
+    # one pipelined round-trip for every live (user_id, username, room_id) on
+    # this worker. Plain ZADD/HSET rather than XX: with several workers another
+    # one may have removed a user who is still connected here (one of their
+    # sockets closed there, or a late tick let them time out), and the next
+    # heartbeat must put them back.
+    now = time.time()
+    async with redis_client.pipeline(transaction=False) as pipe:
+        pipe.zadd(ONLINE_KEY, {user_id: now for user_id, _, _ in entries})
+        pipe.hset(USERNAMES_KEY, mapping={user_id: username for user_id, username, _ in entries})
+        rooms: dict[str, dict] = {}
+        for user_id, _, room_id in entries:
+            rooms.setdefault(room_id, {})[user_id] = now
+        for room_id, members in rooms.items():
+            pipe.zadd(_room_key(room_id), members)
+        await pipe.execute()
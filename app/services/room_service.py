@@ -1,10 +1,17 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, tuple_
 from app.models.room import Room, RoomMember, RoomRole
 from app.models.message import Message
 from app.models.user import User
+from app.core.config import settings
+from app.core.security import hash_password, verify_password
+from app.core.user_cache import TTLCache
+from app.services import membership_service
+from app.services.message_cache import message_cache
 from fastapi import HTTPException
-import bcrypt
+from datetime import datetime
+import base64
+import uuid
 
 
 async def create_room(data, user_id: str, db: AsyncSession):
@@ -14,9 +21,7 @@ async def create_room(data, user_id: str, db: AsyncSession):
 
     lock_password_hash = None
     if data.is_locked and data.lock_password:
-        lock_password_hash = bcrypt.hashpw(
-            data.lock_password.encode(), bcrypt.gensalt()
-        ).decode()
+        lock_password_hash = await hash_password(data.lock_password)
 
     room = Room(
         name=data.name,
@@ -33,6 +38,7 @@ async def create_room(data, user_id: str, db: AsyncSession):
     db.add(member)
     await db.commit()
     await db.refresh(room)
+    await membership_service.add_member(room.id, user_id)
     return room
 
 
@@ -43,7 +49,7 @@ async def verify_room_password(room_id: str, password: str, db: AsyncSession):
         raise HTTPException(status_code=404, detail="Room not found")
     if not room.is_locked:
         return True
-    if not bcrypt.checkpw(password.encode(), room.lock_password.encode()):
+    if not await verify_password(password, room.lock_password):
         raise HTTPException(status_code=403, detail="Wrong room password")
     return True
 
@@ -72,6 +78,8 @@ async def get_or_create_dm(current_user_id: str, target_username: str, db: Async
             db.add(RoomMember(room_id=room.id, user_id=uid, role=RoomRole.member))
         await db.commit()
         await db.refresh(room)
+        for uid in [current_user_id, target_user.id]:
+            await membership_service.add_member(room.id, uid)
 
     return {"room": room, "target_user": target_user}
 
@@ -95,6 +103,7 @@ async def join_room(room_id: str, user_id: str, db: AsyncSession):
 
     db.add(RoomMember(room_id=room_id, user_id=user_id, role=RoomRole.member))
     await db.commit()
+    await membership_service.add_member(room_id, user_id)
     return room
 
 
@@ -109,6 +118,7 @@ async def leave_room(room_id: str, user_id: str, db: AsyncSession):
     if member:
         await db.delete(member)
         await db.commit()
+        await membership_service.remove_member(room_id, user_id)
 
 
 async def get_rooms(db: AsyncSession):
@@ -118,15 +128,91 @@ async def get_rooms(db: AsyncSession):
     return result.scalars().all()
 
 
-async def get_room_messages(room_id: str, db: AsyncSession, limit: int = 50):
-    result = await db.execute(
+def encode_cursor(created_at: datetime, message_id) -> str:
+    raw = f"{created_at.isoformat()}|{message_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    try:
+        created_at, message_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+        return datetime.fromisoformat(created_at), uuid.UUID(message_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+async def get_room_messages(
+    room_id: str,
+    db: AsyncSession,
+    limit: int = 50,
+    before: str | None = None,
+    after: str | None = None,
+):
+    # the newest page is served from the Redis hot-tail when possible
+    if before is None and after is None and limit < message_cache.size:
+        cached = await message_cache.get(room_id, limit + 1)
+        if cached is None:
+            page = await _query_room_messages(room_id, db, message_cache.size)
+            # the fill also returns messages not in Postgres (or the replica) yet
+            cached = (await message_cache.fill(room_id, page["messages"]))[:limit + 1]
+
+        next_cursor = None
+        if len(cached) > limit:
+            last = cached[limit - 1]
+            next_cursor = encode_cursor(datetime.fromisoformat(last["timestamp"]), last["id"])
+        return {"messages": cached[:limit], "next_cursor": next_cursor}
+
+    return await _query_room_messages(room_id, db, limit, before, after)
+
+
+async def _query_room_messages(
+    room_id: str,
+    db: AsyncSession,
+    limit: int,
+    before: str | None = None,
+    after: str | None = None,
+):
+    if before and after:
+        raise HTTPException(status_code=400, detail="Use either before or after, not both")
+
+    # keyset pagination on (created_at, id), served by ix_messages_room_created.
+    # The row comparison alone can't prune partitions, so each cursor also
+    # adds a plain bound on created_at.
+    query = (
         select(Message, User.username)
         .join(User, Message.sender_id == User.id)
         .where(Message.room_id == room_id, Message.is_deleted == False)
-        .order_by(Message.created_at.desc())
-        .limit(limit)
     )
+    if after:
+        created_at, message_id = decode_cursor(after)
+        query = query.where(
+            Message.created_at >= created_at,
+            tuple_(Message.created_at, Message.id) > tuple_(created_at, message_id),
+        ).order_by(Message.created_at.asc(), Message.id.asc())
+    else:
+        if before:
+            created_at, message_id = decode_cursor(before)
+            query = query.where(
+                Message.created_at <= created_at,
+                tuple_(Message.created_at, Message.id) < tuple_(created_at, message_id),
+            )
+        query = query.order_by(Message.created_at.desc(), Message.id.desc())
+
+    # fetch one extra row to know whether another page exists
+    result = await db.execute(query.limit(limit + 1))
     rows = result.all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = None
+    if has_more:
+        last = rows[-1][0]
+        next_cursor = encode_cursor(last.created_at, last.id)
+
+    # always newest first, whichever direction we paged in
+    if after:
+        rows.reverse()
+
     messages = []
     for msg, username in rows:
         messages.append({
@@ -138,7 +224,7 @@ async def get_room_messages(room_id: str, db: AsyncSession, limit: int = 50):
             "timestamp": msg.created_at.isoformat() if msg.created_at else None,
             "type": msg.message_type.value if msg.message_type else "text"
         })
-    return messages
+    return {"messages": messages, "next_cursor": next_cursor}
 
 
 async def create_public_servers(db: AsyncSession):
@@ -158,4 +244,18 @@ async def create_public_servers(db: AsyncSession):
                 is_public_server=True,
             )
             db.add(room)
-    await db.commit()
\ No newline at end of file
+    await db.commit()
+    public_server_cache.clear()
+
+
+# public servers are created at startup and never change afterwards, so the
+# signup path reads their ids from memory instead of scanning rooms
+public_server_cache = TTLCache(1, settings.PUBLIC_SERVER_CACHE_TTL)
+
+async def get_public_server_ids(db: AsyncSession) -> list:
+    ids = public_server_cache.get("ids")
+    if ids is None:
+        result = await db.execute(select(Room.id).where(Room.is_public_server == True))
+        ids = list(result.scalars().all())
+        public_server_cache.set("ids", ids)
+    return ids
\ No newline at end of file
@@ -0,0 +1,112 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, tuple_
+from app.models.message import Message
+from app.models.room import RoomMember
+from app.models.user import User
+from fastapi import HTTPException
+from datetime import datetime
+import base64
+import html
+import uuid
+
+# must match the config of the messages.search_vector generated column
+SEARCH_CONFIG = "english"
+
+# ts_headline marks matches with control characters; the text is HTML-escaped
+# afterwards and only then are they turned into <mark> tags
+START, STOP = "\x02", "\x03"
+HEADLINE_OPTIONS = f"StartSel={START}, StopSel={STOP}, MaxWords=35, MinWords=15, MaxFragments=2"
+
+
+def encode_search_cursor(rank: float, created_at: datetime, message_id) -> str:
+    raw = f"{rank!r}|{created_at.isoformat()}|{message_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_search_cursor(cursor: str):
+    try:
+        rank, created_at, message_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 2)
+        return float(rank), datetime.fromisoformat(created_at), uuid.UUID(message_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def render_highlight(headline: str) -> str:
+    return html.escape(headline).replace(START, "<mark>").replace(STOP, "</mark>")
+
+
+def build_search_query(user_id: str, q: str, limit: int, room_id=None, cursor: str | None = None):
+    ts_query = func.websearch_to_tsquery(SEARCH_CONFIG, q)
+    rank = func.ts_rank_cd(Message.search_vector, ts_query)
+
+    # joining room_members (instead of IN) lets the planner run one
+    # ix_messages_search scan per room the user belongs to
+    matches = (
+        select(Message.id, Message.created_at, rank.label("rank"))
+        .join(RoomMember, (RoomMember.room_id == Message.room_id) & (RoomMember.user_id == user_id))
+        .where(Message.is_deleted == False, Message.search_vector.op("@@")(ts_query))
+    )
+    if room_id is not None:
+        matches = matches.where(Message.room_id == room_id)
+    if cursor:
+        # keyset on (rank, created_at, id); the rank is recomputed identically
+        # for the same query, so it is stable between pages
+        matches = matches.where(
+            tuple_(rank, Message.created_at, Message.id) < tuple_(*decode_search_cursor(cursor))
+        )
+    matches = (
+        matches
+        .order_by(rank.desc(), Message.created_at.desc(), Message.id.desc())
+        .limit(limit + 1)
+        .subquery()
+    )
+
+    # ts_headline is expensive, so it only runs for the rows of this page
+    return (
+        select(
+            Message,
+            User.username,
+            matches.c.rank,
+            func.ts_headline(SEARCH_CONFIG, Message.content, ts_query, HEADLINE_OPTIONS).label("headline"),
+        )
+        # created_at lets each lookup prune to a single partition
+        .join(matches, (matches.c.id == Message.id) & (matches.c.created_at == Message.created_at))
+        .join(User, Message.sender_id == User.id)
+        .order_by(matches.c.rank.desc(), matches.c.created_at.desc(), matches.c.id.desc())
+    )
+
+
+async def search_messages(
+    user_id: str,
+    q: str,
+    db: AsyncSession,
+    limit: int = 20,
+    room_id=None,
+    cursor: str | None = None,
+):
+    result = await db.execute(build_search_query(user_id, q, limit, room_id, cursor))
+    rows = result.all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = None
+    if has_more:
+        last, _, rank, _ = rows[-1]
+        next_cursor = encode_search_cursor(rank, last.created_at, last.id)
+
+    return {
+        "results": [
+            {
+                "id": str(msg.id),
+                "content": msg.content,
+                "highlight": render_highlight(headline),
+                "rank": rank,
+                "username": username,
+                "sender_id": str(msg.sender_id),
+                "room_id": str(msg.room_id),
+                "timestamp": msg.created_at.isoformat() if msg.created_at else None,
+            }
+            for msg, username, rank, headline in rows
+        ],
+        "next_cursor": next_cursor,
+    }
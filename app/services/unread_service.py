@@ -0,0 +1,86 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func
+from app.models.message import Message
+from app.models.room import RoomMember
+from app.redis.client import redis_client
+from datetime import datetime, timezone
+
+# Unread counts without touching every member on every message:
+#   unread:seq             room_id → messages persisted in the room so far
+#   unread:read:{user_id}  room_id → the room's seq when the user last read it
+# so unread = seq - read, and one message costs one HINCRBY however big the
+# room is. Read watermarks also go to room_members.last_read_at, but only in
+# batches: mark_read queues them in unread:dirty ("user_id|room_id" → time)
+# and app.tasks.watermarks flushes that hash periodically.
+SEQ_KEY = "unread:seq"
+DIRTY_KEY = "unread:dirty"
+
+def read_key(user_id: str) -> str:
+    return f"unread:read:{user_id}"
+
+async def record_persisted(rows: list[dict]):
+    # message writer hook, once per committed batch
+    counts: dict[str, int] = {}
+    senders: dict[str, set[str]] = {}
+    for row in rows:
+        room_id = str(row["room_id"])
+        counts[room_id] = counts.get(room_id, 0) + 1
+        senders.setdefault(room_id, set()).add(str(row["sender_id"]))
+
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for room_id, count in counts.items():
+            pipe.hincrby(SEQ_KEY, room_id, count)
+        seqs = dict(zip(counts, await pipe.execute()))
+
+    # your own messages are never unread
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for room_id, user_ids in senders.items():
+            for user_id in user_ids:
+                pipe.hset(read_key(user_id), room_id, seqs[room_id])
+        await pipe.execute()
+
+async def mark_read(user_id: str, room_id: str):
+    seq = await redis_client.hget(SEQ_KEY, room_id)
+    async with redis_client.pipeline(transaction=False) as pipe:
+        pipe.hset(read_key(user_id), room_id, int(seq or 0))
+        pipe.hset(DIRTY_KEY, f"{user_id}|{room_id}", datetime.now(timezone.utc).isoformat())
+        await pipe.execute()
+
+async def get_unread_counts(user_id: str, db: AsyncSession) -> dict[str, int]:
+    result = await db.execute(select(RoomMember.room_id).where(RoomMember.user_id == user_id))
+    room_ids = [str(room_id) for room_id in result.scalars().all()]
+    if not room_ids:
+        return {}
+
+    async with redis_client.pipeline(transaction=False) as pipe:
+        pipe.hmget(SEQ_KEY, room_ids)
+        pipe.hmget(read_key(user_id), room_ids)
+        seqs, reads = await pipe.execute()
+    seqs = {room_id: int(seq or 0) for room_id, seq in zip(room_ids, seqs)}
+    reads = {room_id: int(read) for room_id, read in zip(room_ids, reads) if read is not None}
+
+    missing = [room_id for room_id in room_ids if room_id not in reads]
+    if missing:
+        # no read state in Redis yet (first call, or Redis was flushed): count
+        # what arrived since the Postgres watermark once, and store it as a
+        # read position so later calls are pure Redis
+        backlog = await _count_since_watermark(user_id, missing, db)
+        for room_id in missing:
+            reads[room_id] = seqs[room_id] - backlog.get(room_id, 0)
+        await redis_client.hset(read_key(user_id), mapping={room_id: reads[room_id] for room_id in missing})
+
+    return {room_id: max(0, seqs[room_id] - reads[room_id]) for room_id in room_ids}
+
+async def _count_since_watermark(user_id: str, room_ids: list[str], db: AsyncSession) -> dict[str, int]:
+    result = await db.execute(
+        select(Message.room_id, func.count())
+        .join(RoomMember, (RoomMember.room_id == Message.room_id) & (RoomMember.user_id == user_id))
+        .where(
+            Message.room_id.in_(room_ids),
+            Message.is_deleted == False,
+            Message.sender_id != user_id,
+            Message.created_at > func.coalesce(RoomMember.last_read_at, RoomMember.joined_at),
+        )
+        .group_by(Message.room_id)
+    )
+    return {str(room_id): count for room_id, count in result.all()}
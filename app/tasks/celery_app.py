@@ -1,15 +1,36 @@
 from celery import Celery
+from celery.schedules import crontab
+from redis import Redis
+from sqlalchemy import create_engine
 from app.core.config import settings
 
 celery_app = Celery(
     "chat_app",
     broker=settings.REDIS_URL,
     backend=settings.REDIS_URL,
-    include=["app.tasks.notifications"]
+    include=["app.tasks.notifications", "app.tasks.partitions", "app.tasks.watermarks"]
 )
 
 celery_app.conf.update(
     task_serializer="json",
     result_serializer="json",
     timezone="UTC",
-)
\ No newline at end of file
+    beat_schedule={
+        "notification-digests": {
+            "task": "app.tasks.notifications.send_notification_digests",
+            "schedule": settings.NOTIFICATION_DIGEST_INTERVAL,
+        },
+        "message-partitions": {
+            "task": "app.tasks.partitions.maintain_message_partitions",
+            "schedule": crontab(hour=3, minute=0),
+        },
+        "read-watermarks": {
+            "task": "app.tasks.watermarks.flush_read_watermarks",
+            "schedule": settings.READ_WATERMARK_FLUSH_INTERVAL,
+        },
+    },
+)
+
+# Celery workers are synchronous, so tasks get their own Redis client and engine
+redis_sync = Redis.from_url(settings.REDIS_URL, decode_responses=True)
+sync_engine = create_engine(settings.SYNC_DATABASE_URL, pool_pre_ping=True)
\ No newline at end of file
@@ -1,5 +1,14 @@
-from app.tasks.celery_app import celery_app
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.models.room import Room, RoomMember
+from app.models.user import User
+from app.services.membership_service import LOADED, members_key
+from app.services.notification_service import LAST_KEY, ROOMS_KEY, is_stale, parse_last
+from app.services.presence_service import ONLINE_KEY
+from app.services.unread_service import SEQ_KEY, read_key
+from app.tasks.celery_app import celery_app, redis_sync, sync_engine
 import logging
+import uuid
 
 logger = logging.getLogger(__name__)
 
@@ -11,4 +20,132 @@ def send_offline_notification(self, user_email: str, username: str, room_name: s
         logger.info(f"Hey {username}, you missed a message in {room_name}: {message_content[:50]}")
         return {"status": "sent", "email": user_email}
     except Exception as exc:
-        raise self.retry(exc=exc, countdown=60)
\ No newline at end of file
+        raise self.retry(exc=exc, countdown=60)
+
+@celery_app.task(bind=True, max_retries=3)
+def send_digest_notification(self, user_email: str, username: str, rooms: list[dict]):
+    try:
+        # In production replace with real SMTP
+        total = sum(room["count"] for room in rooms)
+        logger.info(f"Sending digest to {user_email}")
+        logger.info(f"Hey {username}, you missed {total} messages in {len(rooms)} rooms")
+        for room in rooms:
+            logger.info(f"  #{room['room_name']}: {room['count']} new, last from {room['last_username']}: {room['last_preview'][:50]}")
+        return {"status": "sent", "email": user_email, "messages": total}
+    except Exception as exc:
+        raise self.retry(exc=exc, countdown=60)
+
+def _lookup(user_ids: set[str], room_ids: set[str]) -> tuple[dict, dict]:
+    # one query for the recipients and senders and one for the room names of
+    # a whole batch
+    with Session(sync_engine) as db:
+        users = db.execute(
+            select(User.id, User.email, User.username).where(User.id.in_([uuid.UUID(u) for u in user_ids]))
+        ).all()
+        rooms = db.execute(
+            select(Room.id, Room.name).where(Room.id.in_([uuid.UUID(r) for r in room_ids]))
+        ).all()
+    return (
+        {str(user.id): (user.email, user.username) for user in users},
+        {str(room.id): room.name for room in rooms},
+    )
+
+def _room_members(room_ids: list[str]) -> dict[str, set[str]]:
+    # room_id → member ids, from the Redis membership cache where a room's
+    # set is loaded and from Postgres for the others, so no room is skipped
+    with redis_sync.pipeline(transaction=False) as pipe:
+        for room_id in room_ids:
+            pipe.smembers(members_key(room_id))
+        cached = pipe.execute()
+
+    members = {}
+    cold = []
+    for room_id, user_ids in zip(room_ids, cached):
+        if LOADED in user_ids:
+            members[room_id] = user_ids - {LOADED}
+        else:
+            members[room_id] = set()
+            cold.append(room_id)
+    if cold:
+        with Session(sync_engine) as db:
+            rows = db.execute(
+                select(RoomMember.room_id, RoomMember.user_id)
+                .where(RoomMember.room_id.in_([uuid.UUID(r) for r in cold]))
+            ).all()
+        for room_id, user_id in rows:
+            members[str(room_id)].add(str(user_id))
+    return members
+
+@celery_app.task
+def send_notification_digests(batch_size: int = 500):
+    # runs every NOTIFICATION_DIGEST_INTERVAL. In every room with new
+    # messages, a member who is offline now missed the smaller of the room's
+    # count since the last run and their unread count: the unread read
+    # positions leave out their own messages and whatever they read
+    # meanwhile, the per-run count whatever an earlier digest covered
+    with redis_sync.pipeline(transaction=True) as pipe:
+        pipe.hgetall(ROOMS_KEY)
+        pipe.hgetall(LAST_KEY)
+        pipe.delete(ROOMS_KEY, LAST_KEY)
+        counts, last, _ = pipe.execute()
+    if not counts:
+        return {"sent": 0}
+
+    room_ids = list(counts)
+    seqs = dict(zip(room_ids, redis_sync.hmget(SEQ_KEY, room_ids)))
+    last = {room_id: parse_last(last.get(room_id)) for room_id in room_ids}
+    rooms_of: dict[str, list[str]] = {}
+    for room_id, user_ids in _room_members(room_ids).items():
+        for user_id in user_ids:
+            rooms_of.setdefault(user_id, []).append(room_id)
+
+    sent = 0
+    user_ids = list(rooms_of)
+    for start in range(0, len(user_ids), batch_size):
+        batch = user_ids[start:start + batch_size]
+        with redis_sync.pipeline(transaction=False) as pipe:
+            pipe.zmscore(ONLINE_KEY, batch)
+            for user_id in batch:
+                pipe.hmget(read_key(user_id), rooms_of[user_id])
+            last_seen, *reads = pipe.execute()
+
+        digests = {}
+        for user_id, seen, read_seqs in zip(batch, last_seen, reads):
+            # users online now have seen their messages already
+            if not is_stale(seen):
+                continue
+            missed = {}
+            for room_id, read_seq in zip(rooms_of[user_id], read_seqs):
+                count = int(counts[room_id])
+                if read_seq is not None and seqs[room_id] is not None:
+                    count = min(count, int(seqs[room_id]) - int(read_seq))
+                if count > 0:
+                    missed[room_id] = count
+            if missed:
+                digests[user_id] = missed
+        if not digests:
+            continue
+
+        active = {room_id for missed in digests.values() for room_id in missed}
+        users, room_names = _lookup(set(digests) | {last[room_id][0] for room_id in active}, active)
+        for user_id, missed in digests.items():
+            if user_id not in users:
+                continue
+            email, username = users[user_id]
+            rooms = [
+                {
+                    "room_id": room_id,
+                    "room_name": room_names[room_id],
+                    "count": count,
+                    "last_username": users.get(last[room_id][0], (None, "someone"))[1],
+                    "last_preview": last[room_id][1],
+                }
+                for room_id, count in missed.items()
+                if room_id in room_names
+            ]
+            if rooms:
+                send_digest_notification.delay(email, username, rooms)
+                sent += 1
+
+    logger.info("Queued %d digest notifications", sent)
+    return {"sent": sent}
@@ -0,0 +1,45 @@
+from sqlalchemy import text
+from app.core.config import settings
+from app.db.partitions import (
+    PARENT, add_months, ensure_partitions, list_partitions, month_start, partition_month,
+)
+from app.tasks.celery_app import celery_app, sync_engine
+from datetime import datetime, timezone
+import logging
+
+logger = logging.getLogger(__name__)
+
+def partitions_to_archive(partitions: list[str], this_month, retention_months: int) -> list[str]:
+    # whole months older than the retention window, oldest first
+    if retention_months <= 0:
+        return []
+    cutoff = add_months(this_month, -retention_months)
+    old = [
+        (month, name) for name in partitions
+        if (month := partition_month(name)) is not None and month < cutoff
+    ]
+    return [name for _, name in sorted(old)]
+
+@celery_app.task
+def maintain_message_partitions():
+    # runs daily: keeps MESSAGE_PARTITION_MONTHS_AHEAD future months created,
+    # so inserts never hit a missing partition, and moves months past the
+    # retention window out of messages into the archive schema
+    this_month = month_start(datetime.now(timezone.utc).date())
+
+    # DETACH ... CONCURRENTLY can't run inside a transaction block
+    with sync_engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        ensure_partitions(conn, this_month, add_months(this_month, settings.MESSAGE_PARTITION_MONTHS_AHEAD))
+
+        archived = partitions_to_archive(
+            list_partitions(conn), this_month, settings.MESSAGE_PARTITION_RETENTION_MONTHS
+        )
+        if archived:
+            conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {settings.MESSAGE_ARCHIVE_SCHEMA}"))
+        for name in archived:
+            # readers and writers of the live months are not blocked
+            conn.execute(text(f"ALTER TABLE {PARENT} DETACH PARTITION {name} CONCURRENTLY"))
+            conn.execute(text(f"ALTER TABLE {name} SET SCHEMA {settings.MESSAGE_ARCHIVE_SCHEMA}"))
+            logger.info("Archived partition %s to schema %s", name, settings.MESSAGE_ARCHIVE_SCHEMA)
+
+    return {"archived": archived}
@@ -0,0 +1,61 @@
+from sqlalchemy import bindparam, func, update
+from app.models.room import RoomMember
+from app.services.unread_service import DIRTY_KEY
+from app.tasks.celery_app import celery_app, redis_sync, sync_engine
+from datetime import datetime
+import logging
+import uuid
+
+logger = logging.getLogger(__name__)
+
+def parse_watermarks(dirty: dict[str, str]) -> list[dict]:
+    # "user_id|room_id" → ISO timestamp, as queued by unread_service.mark_read
+    rows = []
+    for key, read_at in dirty.items():
+        user_id, room_id = key.split("|", 1)
+        rows.append({
+            "b_user_id": uuid.UUID(user_id),
+            "b_room_id": uuid.UUID(room_id),
+            "b_read_at": datetime.fromisoformat(read_at),
+        })
+    return rows
+
+# executemany: one statement, one round-trip for the whole batch. GREATEST
+# keeps a watermark from moving backwards if an older flush lands late.
+watermark_update = (
+    update(RoomMember.__table__)
+    .where(
+        RoomMember.__table__.c.user_id == bindparam("b_user_id"),
+        RoomMember.__table__.c.room_id == bindparam("b_room_id"),
+    )
+    .values(last_read_at=func.greatest(
+        func.coalesce(RoomMember.__table__.c.last_read_at, bindparam("b_read_at")),
+        bindparam("b_read_at"),
+    ))
+)
+
+@celery_app.task
+def flush_read_watermarks():
+    # runs every READ_WATERMARK_FLUSH_INTERVAL; however often a user reads a
+    # room in between, only the latest watermark per (user, room) is written
+    with redis_sync.pipeline(transaction=True) as pipe:
+        pipe.hgetall(DIRTY_KEY)
+        pipe.delete(DIRTY_KEY)
+        dirty, _ = pipe.execute()
+    if not dirty:
+        return {"flushed": 0}
+
+    rows = parse_watermarks(dirty)
+    try:
+        with sync_engine.begin() as conn:
+            conn.execute(watermark_update, rows)
+    except Exception:
+        # put them back unless a newer read was queued meanwhile
+        with redis_sync.pipeline(transaction=False) as pipe:
+            for key, read_at in dirty.items():
+                pipe.hsetnx(DIRTY_KEY, key, read_at)
+            pipe.execute()
+        raise
+
+    logger.info("Flushed %d read watermarks", len(rows))
+    return {"flushed": len(rows)}
@@ -1,38 +1,374 @@
-from collections import defaultdict
 from fastapi import WebSocket
-import json
+from app.core.config import settings
+from app.core.metrics import BROADCAST_FANOUT, BROADCAST_LATENCY
+from app.redis.client import redis_client
+from app.services.presence_service import refresh_presence_many
+import asyncio
+import logging
+import orjson
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+PING_FRAME = orjson.dumps({"type": "ping"}).decode()
+
+class Connection:
+    # one per socket, shared by every index that points at it
+    __slots__ = ("websocket", "user_id", "username", "rooms", "queue", "writer", "last_seen", "held")
+
+    def __init__(self, websocket: WebSocket, user_id: str, username: str, queue_size: int):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.username = username
+        self.rooms: set[str] = set()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.writer: asyncio.Task | None = None
+        self.last_seen = time.monotonic()
+        # room_id → live frames kept back while that room is being replayed
+        self.held: dict[str, list[str]] = {}
 
 class ConnectionManager:
-    def __init__(self):
-        # room_id → list of (websocket, user_id, username)
-        self.active_connections: dict[str, list[tuple]] = defaultdict(list)
+    def __init__(
+        self,
+        redis=None,
+        channel_prefix: str = "ws:room:",
+        send_queue_size: int = 256,
+        overflow_policy: str = "drop_oldest",
+        heartbeat_interval: float | None = None,
+        heartbeat_timeout: float = 60,
+        on_heartbeat=None,
+        reconnect_delay: float = 0.5,
+        max_reconnect_delay: float = 30,
+    ):
+        # indexes, all O(1) to insert into and remove from:
+        #   websocket → Connection
+        #   room_id → {websocket: Connection}, a room disappears with its last socket
+        #   user_id → {websocket: Connection}
+        # a multiplexed socket appears once in every room it is subscribed to
+        self.connections: dict[WebSocket, Connection] = {}
+        self.active_connections: dict[str, dict[WebSocket, Connection]] = {}
+        self.user_connections: dict[str, dict[WebSocket, Connection]] = {}
+
+        # cluster mode: every broadcast is also published to Redis so that
+        # other workers can relay it to their own sockets
+        self.redis = redis
+        self.channel_prefix = channel_prefix
+        self.worker_id = uuid.uuid4().hex
+        self._pubsub = None
+        self._listener: asyncio.Task | None = None
+        # the listener resubscribes with exponential backoff whenever its
+        # connection breaks; while `listener_connected` is False this worker
+        # only sees its own broadcasts
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.listener_connected = False
+        self.listener_reconnects = 0
+
+        # every socket gets a bounded outbound queue drained by its own writer
+        # task, so broadcasting never waits on a slow client
+        self.send_queue_size = send_queue_size
+        self.overflow_policy = overflow_policy
+        self.dropped_frames = 0
+        self.slow_consumer_disconnects = 0
+
+        # heartbeat: every tick pings all sockets, reaps the ones that stayed
+        # silent past the timeout and hands the live (user_id, username,
+        # room_id) entries to `on_heartbeat` in one batch (used to refresh presence)
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.on_heartbeat = on_heartbeat
+        self._heartbeat: asyncio.Task | None = None
+        self.reaped_connections = 0
+
+        # rooms currently held for a replay, across all sockets; while it is
+        # 0 broadcasting doesn't look at Connection.held at all
+        self.holding = 0
+
+    async def start(self):
+        if self.heartbeat_interval and self._heartbeat is None:
+            self._heartbeat = asyncio.create_task(self._heartbeat_loop())
+        if self.redis is None or self._listener is not None:
+            return
+        await self._subscribe()
+        self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            self._heartbeat = None
+        for conn in self.connections.values():
+            conn.writer.cancel()
+        self.connections.clear()
+        self.active_connections.clear()
+        self.user_connections.clear()
+        self.holding = 0
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        await self._unsubscribe()
 
     async def connect(self, websocket: WebSocket, room_id: str, user_id: str, username: str):
+        # single-room socket: register and subscribe in one go
+        await self.register(websocket, user_id, username)
+        self.subscribe(websocket, room_id)
+
+    async def register(self, websocket: WebSocket, user_id: str, username: str):
         await websocket.accept()
-        self.active_connections[room_id].append((websocket, user_id, username))
+        conn = Connection(websocket, user_id, username, self.send_queue_size)
+        conn.writer = asyncio.create_task(self._writer(conn))
+        self.connections[websocket] = conn
+        self.user_connections.setdefault(user_id, {})[websocket] = conn
 
-    def disconnect(self, websocket: WebSocket, room_id: str):
-        self.active_connections[room_id] = [
-            conn for conn in self.active_connections[room_id]
-            if conn[0] != websocket
-        ]
+    def subscribe(self, websocket: WebSocket, room_id: str, hold: bool = False):
+        # hold=True keeps the room's live frames back until release(), so a
+        # replay fetched after subscribing can still be delivered first
+        conn = self.connections.get(websocket)
+        if conn is None or room_id in conn.rooms:
+            return
+        conn.rooms.add(room_id)
+        if hold:
+            conn.held[room_id] = []
+            self.holding += 1
+        self.active_connections.setdefault(room_id, {})[websocket] = conn
+
+    def release(self, websocket: WebSocket, room_id: str, events: list[dict]):
+        # sends `events` (the replay), then the frames held since subscribe
+        # that the replay didn't already contain
+        conn = self.connections.get(websocket)
+        if conn is None or room_id not in conn.held:
+            return
+        held = conn.held.pop(room_id)
+        self.holding -= 1
+        replayed = {event["event_id"] for event in events if "event_id" in event}
+        frames = [orjson.dumps(event).decode() for event in events]
+        for frame in held:
+            if not replayed or orjson.loads(frame).get("event_id") not in replayed:
+                frames.append(frame)
+        for frame in frames:
+            self._enqueue([conn], frame)
+
+    def unsubscribe(self, websocket: WebSocket, room_id: str):
+        conn = self.connections.get(websocket)
+        if conn is None or room_id not in conn.rooms:
+            return
+        conn.rooms.discard(room_id)
+        if conn.held.pop(room_id, None) is not None:
+            self.holding -= 1
+        self._remove_from(self.active_connections, room_id, websocket)
+
+    def disconnect(self, websocket: WebSocket):
+        conn = self.connections.pop(websocket, None)
+        if conn is None:
+            return
+        for room_id in conn.rooms:
+            self._remove_from(self.active_connections, room_id, websocket)
+        conn.rooms.clear()
+        self.holding -= len(conn.held)
+        conn.held.clear()
+        self._remove_from(self.user_connections, conn.user_id, websocket)
+        if conn.writer is not None and conn.writer is not asyncio.current_task():
+            conn.writer.cancel()
+
+    @staticmethod
+    def _remove_from(index: dict, key: str, websocket: WebSocket):
+        bucket = index.get(key)
+        if bucket is None:
+            return
+        bucket.pop(websocket, None)
+        if not bucket:
+            del index[key]
 
     async def broadcast_to_room(self, message: dict, room_id: str):
-        dead_connections = []
-        for conn in self.active_connections[room_id]:
+        start = time.perf_counter()
+
+        # multiplexed clients route frames by room_id
+        if "room_id" not in message:
+            message = {**message, "room_id": room_id}
+
+        # encode once and hand the same text frame to every socket
+        frame = orjson.dumps(message).decode()
+
+        # deliver to local sockets first, then let the other workers do the same
+        BROADCAST_FANOUT.observe(self._send_local(frame, room_id))
+        if self.redis is not None:
+            await self.redis.publish(
+                f"{self.channel_prefix}{room_id}",
+                f"{self.worker_id}|{frame}",
+            )
+        BROADCAST_LATENCY.observe(time.perf_counter() - start)
+
+    def send_personal(self, message: dict, websocket: WebSocket):
+        conn = self.connections.get(websocket)
+        if conn is not None and not conn.queue.full():
+            conn.queue.put_nowait(orjson.dumps(message).decode())
+
+    def send_to_user(self, message: dict, user_id: str):
+        # every socket this user has open on this worker
+        conns = self.user_connections.get(user_id)
+        if conns:
+            self._enqueue(list(conns.values()), orjson.dumps(message).decode())
+
+    def touch(self, websocket: WebSocket):
+        # any inbound frame proves the client is alive
+        conn = self.connections.get(websocket)
+        if conn is not None:
+            conn.last_seen = time.monotonic()
+
+    async def heartbeat_tick(self):
+        cutoff = time.monotonic() - self.heartbeat_timeout
+        for conn in list(self.connections.values()):
+            if conn.last_seen < cutoff:
+                self.reaped_connections += 1
+                self.disconnect(conn.websocket)
+                asyncio.create_task(self._close(conn.websocket, code=1001))
+
+        # one ping per socket, however many rooms it is subscribed to
+        for conn in self.connections.values():
+            if not conn.queue.full():
+                conn.queue.put_nowait(PING_FRAME)
+
+        live = [
+            (conn.user_id, conn.username, room_id)
+            for room_id, conns in self.active_connections.items()
+            for conn in conns.values()
+        ]
+        if self.on_heartbeat is not None and live:
+            await self.on_heartbeat(live)
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
             try:
-                await conn[0].send_json(message)
+                await self.heartbeat_tick()
             except Exception:
-                dead_connections.append(conn)
+                logger.exception("Heartbeat tick failed")
+
+    def _send_local(self, frame: str, room_id: str) -> int:
+        conns = self.active_connections.get(room_id)
+        if not conns:
+            return 0
+        targets = list(conns.values())
+        if self.holding:
+            targets = [conn for conn in targets if not self._hold(conn, room_id, frame)]
+        self._enqueue(targets, frame)
+        return len(conns)
+
+    @staticmethod
+    def _hold(conn: Connection, room_id: str, frame: str) -> bool:
+        held = conn.held.get(room_id)
+        if held is None:
+            return False
+        held.append(frame)
+        return True
+
+    def _enqueue(self, conns: list[Connection], frame: str):
+        slow_connections = []
+        for conn in conns:
+            if conn.queue.full():
+                self.dropped_frames += 1
+                if self.overflow_policy == "disconnect":
+                    slow_connections.append(conn)
+                    continue
+                conn.queue.get_nowait()
+            conn.queue.put_nowait(frame)
+
+        # slow consumers under the "disconnect" policy are closed in the background
+        for conn in slow_connections:
+            self.slow_consumer_disconnects += 1
+            self.disconnect(conn.websocket)
+            asyncio.create_task(self._close(conn.websocket))
+
+    async def _writer(self, conn: Connection):
+        while True:
+            frame = await conn.queue.get()
+            try:
+                await conn.websocket.send_text(frame)
+            except Exception:
+                # clean up dead connection
+                self.disconnect(conn.websocket)
+                return
+
+    async def _close(self, websocket: WebSocket, code: int = 1008):
+        try:
+            await websocket.close(code=code)
+        except Exception:
+            pass
+
+    async def _subscribe(self):
+        self._pubsub = self.redis.pubsub()
+        await self._pubsub.psubscribe(f"{self.channel_prefix}*")
+        self.listener_connected = True
+
+    async def _unsubscribe(self):
+        self.listener_connected = False
+        if self._pubsub is None:
+            return
+        pubsub, self._pubsub = self._pubsub, None
+        try:
+            await pubsub.punsubscribe()
+        except Exception:
+            # the connection is usually what broke
+            pass
+        finally:
+            await pubsub.aclose()
+
+    async def _listen(self):
+        delay = self.reconnect_delay
+        while True:
+            try:
+                if self._pubsub is None:
+                    await self._subscribe()
+                    self.listener_reconnects += 1
+                    logger.info("Pub/sub listener resubscribed")
+                delay = self.reconnect_delay
+                async for event in self._pubsub.listen():
+                    self._relay(event)
+                logger.error("Pub/sub listener stream ended, resubscribing in %.1fs", delay)
+            except Exception:
+                # Redis restart, connection reset: without this the task would
+                # end silently and cross-worker fan-out would stop for good
+                logger.exception("Pub/sub listener failed, resubscribing in %.1fs", delay)
+            await self._unsubscribe()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    def _relay(self, event: dict):
+        if event["type"] != "pmessage":
+            return
+        try:
+            # payload is "<origin worker id>|<encoded frame>"
+            origin, frame = event["data"].split("|", 1)
+            if origin == self.worker_id:
+                return
+            room_id = event["channel"][len(self.channel_prefix):]
+            self._send_local(frame, room_id)
+        except Exception:
+            logger.exception("Failed to relay pub/sub event")
+
+    def is_connected(self, user_id: str) -> bool:
+        return user_id in self.user_connections
 
-        # clean up dead connections
-        for conn in dead_connections:
-            self.active_connections[room_id].remove(conn)
+    def user_in_room(self, user_id: str, room_id: str) -> bool:
+        # any of the user's sockets on this worker, e.g. another tab
+        return any(room_id in conn.rooms for conn in self.user_connections.get(user_id, {}).values())
 
     def get_online_users(self, room_id: str) -> list:
         return [
-            {"user_id": conn[1], "username": conn[2]}
-            for conn in self.active_connections[room_id]
+            {"user_id": conn.user_id, "username": conn.username}
+            for conn in self.active_connections.get(room_id, {}).values()
         ]
 
-manager = ConnectionManager()
\ No newline at end of file
+manager = ConnectionManager(
+    redis=redis_client if settings.WS_BROADCAST_MODE == "redis" else None,
+    channel_prefix=settings.WS_CHANNEL_PREFIX,
+    send_queue_size=settings.WS_SEND_QUEUE_SIZE,
+    overflow_policy=settings.WS_OVERFLOW_POLICY,
+    heartbeat_interval=settings.WS_HEARTBEAT_INTERVAL,
+    heartbeat_timeout=settings.WS_HEARTBEAT_TIMEOUT,
+    on_heartbeat=refresh_presence_many,
+)
@@ -0,0 +1,82 @@
+from fastapi import WebSocket
+from app.core.config import settings
+from app.core.metrics import WS_RATE_LIMITED
+import time
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float) -> float:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return self.tokens
+
+class FrameLimiter:
+    # token buckets for inbound WebSocket frames, one per (socket, kind) and
+    # one per (user, kind) shared by all of that user's sockets on this worker.
+    # A frame costs one token from both; it is only charged when both have one.
+    # Everything is in memory, so checking a frame never leaves the process.
+    def __init__(self, socket_limits: dict[str, tuple[float, float]], user_limits: dict[str, tuple[float, float]]):
+        # kind → (tokens per second, burst)
+        self.socket_limits = socket_limits
+        self.user_limits = user_limits
+        self.sockets: dict[WebSocket, dict[str, TokenBucket]] = {}
+        # user_id → [open sockets, {kind: TokenBucket}]
+        self.users: dict[str, list] = {}
+        self.limited = {"socket": 0, "user": 0}
+
+    def add(self, websocket: WebSocket, user_id: str):
+        self.sockets[websocket] = {
+            kind: TokenBucket(rate, burst) for kind, (rate, burst) in self.socket_limits.items()
+        }
+        entry = self.users.get(user_id)
+        if entry is None:
+            entry = self.users[user_id] = [0, {
+                kind: TokenBucket(rate, burst) for kind, (rate, burst) in self.user_limits.items()
+            }]
+        entry[0] += 1
+
+    def discard(self, websocket: WebSocket, user_id: str):
+        if self.sockets.pop(websocket, None) is None:
+            return
+        entry = self.users[user_id]
+        entry[0] -= 1
+        if entry[0] == 0:
+            del self.users[user_id]
+
+    def allow(self, websocket: WebSocket, user_id: str, kind: str) -> bool:
+        now = time.monotonic()
+        socket_bucket = self.sockets.get(websocket, {}).get(kind)
+        user_bucket = self.users[user_id][1].get(kind) if user_id in self.users else None
+
+        if socket_bucket is not None and socket_bucket.refill(now) < 1:
+            self.limited["socket"] += 1
+            WS_RATE_LIMITED.labels(kind, "socket").inc()
+            return False
+        if user_bucket is not None and user_bucket.refill(now) < 1:
+            self.limited["user"] += 1
+            WS_RATE_LIMITED.labels(kind, "user").inc()
+            return False
+
+        if socket_bucket is not None:
+            socket_bucket.tokens -= 1
+        if user_bucket is not None:
+            user_bucket.tokens -= 1
+        return True
+
+frame_limiter = FrameLimiter(
+    socket_limits={
+        "message": (settings.WS_MESSAGE_RATE, settings.WS_MESSAGE_BURST),
+        "typing": (settings.WS_TYPING_RATE, settings.WS_TYPING_BURST),
+    },
+    user_limits={
+        "message": (settings.WS_USER_MESSAGE_RATE, settings.WS_USER_MESSAGE_BURST),
+        "typing": (settings.WS_USER_TYPING_RATE, settings.WS_USER_TYPING_BURST),
+    },
+)
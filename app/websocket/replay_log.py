@@ -0,0 +1,60 @@
+from app.core.config import settings
+from app.redis.client import redis_client
+import orjson
+
+class ReplayLog:
+    # A bounded Redis Stream per room holding the events broadcast there, so a
+    # client that reconnects can send the last event_id it saw and get exactly
+    # what it missed instead of refetching history. Stream ids grow
+    # monotonically and double as the event_id sent with every frame.
+    #
+    # Trimming only ever drops the oldest entries, so as long as the client's
+    # last event is still in the stream everything after it is too. Once it has
+    # been trimmed (or never existed) the gap can't be proven complete and the
+    # client is told to resync from history instead.
+    def __init__(self, redis, maxlen: int = 1000, ttl: int = 86400, prefix: str = "ws:replay:"):
+        self.redis = redis
+        self.maxlen = maxlen
+        self.ttl = ttl
+        self.prefix = prefix
+        self.replayed = 0
+        self.resyncs = 0
+
+    def _key(self, room_id: str) -> str:
+        return f"{self.prefix}{room_id}"
+
+    async def append(self, room_id: str, message: dict) -> dict:
+        # returns the event as it should be broadcast, with its event_id
+        if "room_id" not in message:
+            message = {**message, "room_id": room_id}
+        if not self.maxlen:
+            return message
+        async with self.redis.pipeline(transaction=False) as pipe:
+            # approximate trimming lets Redis drop whole nodes, which is O(1)
+            pipe.xadd(self._key(room_id), {"e": orjson.dumps(message)}, maxlen=self.maxlen, approximate=True)
+            # streams of rooms nobody talks in anymore go away on their own
+            pipe.expire(self._key(room_id), self.ttl)
+            event_id, _ = await pipe.execute()
+        return {**message, "event_id": event_id}
+
+    async def since(self, room_id: str, last_event_id: str) -> list[dict] | None:
+        # events after last_event_id, oldest first, or None when they can't
+        # all be replayed from the log
+        ms, _, seq = last_event_id.partition("-")
+        entries = []
+        if ms.isdigit() and seq.isdigit():
+            # the range is inclusive, so its first entry proves the client's
+            # last event is still retained
+            entries = await self.redis.xrange(self._key(room_id), min=last_event_id)
+        if not entries or entries[0][0] != last_event_id:
+            self.resyncs += 1
+            return None
+        events = [{**orjson.loads(fields["e"]), "event_id": event_id} for event_id, fields in entries[1:]]
+        self.replayed += len(events)
+        return events
+
+replay_log = ReplayLog(
+    redis_client,
+    maxlen=settings.WS_REPLAY_MAXLEN,
+    ttl=settings.WS_REPLAY_TTL,
+)
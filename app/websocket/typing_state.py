@@ -0,0 +1,133 @@
+from app.core.config import settings
+from app.redis.client import redis_client
+from app.websocket.manager import manager
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+class TypingCoalescer:
+    # Collects typing events per room and emits at most one "typing_state"
+    # frame per room every `interval` seconds, listing everyone typing there.
+    # A typer expires `ttl` seconds after their last event, so clients that
+    # vanish without sending is_typing=false are cleared automatically and
+    # the fan-out cost is bounded per room instead of per keystroke.
+    #
+    # With Redis, a room's typers also live in a hash shared by all workers
+    # (user_id → "expires_at|username"). Each worker writes only for its own
+    # sockets, at most every ttl/2 per typer, and re-reads the hash before
+    # emitting, so every frame carries the whole room.
+    def __init__(
+        self,
+        broadcast,
+        redis=None,
+        interval: float = 0.3,
+        ttl: float = 6,
+        prefix: str = "typing:",
+    ):
+        self.broadcast = broadcast
+        self.redis = redis
+        self.interval = interval
+        self.ttl = ttl
+        self.prefix = prefix
+        # room_id → user_id → [username, expires_at, synced_at], typers on this worker
+        self.typers: dict[str, dict[str, list]] = {}
+        self.dirty: set[str] = set()
+        self._task: asyncio.Task | None = None
+        self.events = 0
+        self.frames = 0
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def _key(self, room_id: str) -> str:
+        return f"{self.prefix}{room_id}"
+
+    async def update(self, room_id: str, user_id: str, username: str, is_typing: bool):
+        self.events += 1
+        if not is_typing:
+            await self.clear(room_id, user_id)
+            return
+
+        now = time.time()
+        room = self.typers.setdefault(room_id, {})
+        typer = room.get(user_id)
+        if typer is None:
+            # only a new typer changes what the room sees
+            typer = room[user_id] = [username, now + self.ttl, 0.0]
+            self.dirty.add(room_id)
+        else:
+            typer[1] = now + self.ttl
+
+        if self.redis is not None and now - typer[2] >= self.ttl / 2:
+            # the shared entry outlives the local one by ttl/2, so it never
+            # expires while this worker still counts the user as typing
+            typer[2] = now
+            key = self._key(room_id)
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.hset(key, user_id, f"{now + self.ttl * 1.5}|{username}")
+                pipe.expire(key, int(self.ttl * 2))
+                await pipe.execute()
+
+    async def clear(self, room_id: str, user_id: str):
+        # stopped typing, sent the message or left the room
+        room = self.typers.get(room_id)
+        if room is None or room.pop(user_id, None) is None:
+            return
+        if not room:
+            del self.typers[room_id]
+        self.dirty.add(room_id)
+        if self.redis is not None:
+            await self.redis.hdel(self._key(room_id), user_id)
+
+    async def flush(self):
+        now = time.time()
+        for room_id, room in list(self.typers.items()):
+            for user_id in [u for u, typer in room.items() if typer[1] <= now]:
+                await self.clear(room_id, user_id)
+
+        dirty, self.dirty = self.dirty, set()
+        for room_id in dirty:
+            await self.broadcast({"type": "typing_state", "typers": await self._snapshot(room_id, now)}, room_id)
+            self.frames += 1
+
+    async def _snapshot(self, room_id: str, now: float) -> list[dict]:
+        if self.redis is None:
+            return [
+                {"user_id": user_id, "username": typer[0]}
+                for user_id, typer in self.typers.get(room_id, {}).items()
+            ]
+        typers = []
+        for user_id, value in (await self.redis.hgetall(self._key(room_id))).items():
+            expires_at, username = value.split("|", 1)
+            # entries left behind by a worker that died are skipped
+            if float(expires_at) > now:
+                typers.append({"user_id": user_id, "username": username})
+        return typers
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Typing flush failed")
+
+typing_coalescer = TypingCoalescer(
+    broadcast=manager.broadcast_to_room,
+    redis=redis_client if settings.WS_BROADCAST_MODE == "redis" else None,
+    interval=settings.WS_TYPING_INTERVAL_MS / 1000,
+    ttl=settings.WS_TYPING_TTL,
+)
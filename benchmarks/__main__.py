@@ -0,0 +1,25 @@
+# Hot path benchmark suite.
+#
+#   python -m benchmarks                         print ops/s, p50 and p99
+#   python -m benchmarks --json base.json        also save the report (tagged with the commit)
+#   python -m benchmarks --compare base.json     show the ops/s change against a saved report
+import argparse
+import asyncio
+from benchmarks.harness import print_results, write_report
+from benchmarks.hot_path import run_all
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--compare", help="saved report to compare against")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_all())
+    print_results(results, args.compare)
+    if args.json:
+        write_report(args.json, results)
+
+
+if __name__ == "__main__":
+    main()
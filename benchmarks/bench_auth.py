@@ -0,0 +1,50 @@
+# Requests/sec for an authenticated endpoint (GET /api/v1/auth/me) through the
+# in-process ASGI app, with and without the token → user cache. The database is
+# a stand-in that costs DB_LATENCY per query, roughly one Postgres round-trip.
+#
+#   python -m benchmarks.bench_auth
+import asyncio
+import time
+from httpx import AsyncClient, ASGITransport
+from app.core import user_cache
+from app.core.security import create_access_token
+from app.db.session import get_read_session_opener
+from app.main import app
+from benchmarks.harness import FakeSession, FakeUser
+
+DB_LATENCY = 0.0005
+REQUESTS = 2000
+CONCURRENCY = 20
+
+
+async def fake_session_opener():
+    return lambda: FakeSession([FakeUser], latency=DB_LATENCY)
+
+
+async def run(client: AsyncClient, headers: dict, cached: bool) -> float:
+    user_cache.token_cache.maxsize = user_cache.user_cache.maxsize = 10000 if cached else 0
+    user_cache.token_cache.clear()
+    user_cache.user_cache.clear()
+
+    async def worker(n: int):
+        for _ in range(n):
+            response = await client.get("/api/v1/auth/me", headers=headers)
+            assert response.status_code == 200
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(REQUESTS // CONCURRENCY) for _ in range(CONCURRENCY)))
+    return REQUESTS / (time.perf_counter() - start)
+
+
+async def main():
+    app.dependency_overrides[get_read_session_opener] = fake_session_opener
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': str(FakeUser.id)})}"}
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as client:
+        before = await run(client, headers, cached=False)
+        after = await run(client, headers, cached=True)
+    print(f"uncached: {before:8.0f} req/s")
+    print(f"cached:   {after:8.0f} req/s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,71 @@
+# CPU per broadcast message by room size. The first two columns are the
+# serialization cost alone: json.dumps for every socket (the old send_json
+# path) vs one orjson encode. The last column is the whole broadcast through
+# ConnectionManager, including queueing and the writer tasks.
+#
+#   python -m benchmarks.bench_broadcast
+import asyncio
+import json
+import orjson
+import time
+from app.websocket.manager import ConnectionManager
+from benchmarks.harness import NullWebSocket
+
+ROOM_SIZES = [10, 100, 1000, 5000]
+MESSAGES = 50
+
+MESSAGE = {
+    "type": "message",
+    "message_id": "6f1c2a9e-3a59-4c55-9d6e-2b0f1c9b7a10",
+    "room_id": "b2d6c1a4-8f3e-4a7c-9c1d-5e2f3a4b6c7d",
+    "sender_id": "0a9b8c7d-6e5f-4a3b-2c1d-0e9f8a7b6c5d",
+    "username": "tisha",
+    "content": "Deployed 5 mins ago 🚀" * 4,
+    "timestamp": "2026-03-07T18:35:37.047143+00:00",
+}
+
+
+def orjson_once() -> float:
+    start = time.process_time()
+    for _ in range(MESSAGES):
+        orjson.dumps(MESSAGE).decode()
+    return (time.process_time() - start) / MESSAGES
+
+
+def per_socket_encode(room_size: int) -> float:
+    start = time.process_time()
+    for _ in range(MESSAGES):
+        for _ in range(room_size):
+            # what starlette's send_json does for every recipient
+            json.dumps(MESSAGE, separators=(",", ":"), ensure_ascii=False)
+    return (time.process_time() - start) / MESSAGES
+
+
+async def broadcast(room_size: int) -> float:
+    manager = ConnectionManager(send_queue_size=MESSAGES)
+    for i in range(room_size):
+        await manager.connect(NullWebSocket(), "room", str(i), f"user{i}")
+    await asyncio.sleep(0)
+
+    start = time.process_time()
+    for _ in range(MESSAGES):
+        await manager.broadcast_to_room(MESSAGE, "room")
+        # let the writer tasks flush so their cost is included
+        await asyncio.sleep(0)
+    elapsed = (time.process_time() - start) / MESSAGES
+
+    await manager.stop()
+    return elapsed
+
+
+async def main():
+    print(f"{'room size':>10} {'json per socket (ms)':>22} {'orjson once (ms)':>18} {'broadcast (ms)':>16}")
+    for size in ROOM_SIZES:
+        before = per_socket_encode(size)
+        after = orjson_once()
+        total = await broadcast(size)
+        print(f"{size:>10} {before * 1000:>22.3f} {after * 1000:>18.4f} {total * 1000:>16.3f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
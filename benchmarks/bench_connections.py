@@ -0,0 +1,50 @@
+# Connect/disconnect churn on ConnectionManager with 50k live sockets: the
+# manager is filled, then a random socket leaves and a new one joins, over
+# and over. Run once with every socket in one huge room and once spread over
+# many small rooms; with indexed rooms both should cost about the same.
+#
+#   python -m benchmarks.bench_connections
+import asyncio
+import random
+import time
+from app.websocket.manager import ConnectionManager
+from benchmarks.harness import NullWebSocket
+
+CONNECTIONS = 50_000
+CHURN = 50_000
+
+
+async def churn(rooms: int) -> tuple[float, float]:
+    manager = ConnectionManager()
+    sockets = []
+
+    start = time.perf_counter()
+    for i in range(CONNECTIONS):
+        ws = NullWebSocket()
+        await manager.connect(ws, f"room-{i % rooms}", f"user-{i}", f"user{i}")
+        sockets.append(ws)
+    fill = CONNECTIONS / (time.perf_counter() - start)
+
+    rng = random.Random(0)
+    start = time.perf_counter()
+    for i in range(CHURN):
+        index = rng.randrange(len(sockets))
+        manager.disconnect(sockets[index])
+        ws = NullWebSocket()
+        await manager.connect(ws, f"room-{rng.randrange(rooms)}", f"churn-{i}", f"churn{i}")
+        sockets[index] = ws
+    churn_rate = CHURN / (time.perf_counter() - start)
+
+    await manager.stop()
+    return fill, churn_rate
+
+
+async def main():
+    print(f"{'rooms':>6} {'connect (ops/s)':>16} {'disconnect+connect (ops/s)':>28}")
+    for rooms in (1, 500):
+        fill, churn_rate = await churn(rooms)
+        print(f"{rooms:>6} {fill:>16.0f} {churn_rate:>28.0f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,50 @@
+# Signup burst: many concurrent registrations against a database stand-in that
+# costs DB_LATENCY per round-trip (statement or commit). bcrypt is replaced by
+# a no-op so the numbers show the database work only; hashing has its own
+# bounded pool (see PasswordHasher).
+#
+#   python -m benchmarks.bench_signup
+import asyncio
+import time
+import uuid
+import fakeredis
+from app.schemas.user import UserRegister
+from app.services import auth_service, membership_service, room_service
+from benchmarks.harness import FakeSession
+
+DB_LATENCY = 0.0005
+SIGNUPS = 2000
+CONCURRENCY = 50
+
+
+async def no_hash(password: str) -> str:
+    return password
+
+
+async def run(public_servers: int) -> tuple[float, float]:
+    rooms = [uuid.uuid4() for _ in range(public_servers)]
+    room_service.public_server_cache.clear()
+    FakeSession.round_trips = 0
+
+    async def worker(offset: int, n: int):
+        for i in range(offset, offset + n):
+            data = UserRegister(username=f"user{i}", email=f"user{i}@bench.com", password="password123")
+            await auth_service.register_user(data, FakeSession(rooms, latency=DB_LATENCY))
+
+    per_worker = SIGNUPS // CONCURRENCY
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(w * per_worker, per_worker) for w in range(CONCURRENCY)))
+    elapsed = time.perf_counter() - start
+    return SIGNUPS / elapsed, FakeSession.round_trips / SIGNUPS
+
+
+async def main():
+    auth_service.hash_password = no_hash
+    membership_service.redis_client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    for public_servers in (4, 20, 100):
+        rate, round_trips = await run(public_servers)
+        print(f"{public_servers:>3} public servers: {rate:8.0f} signups/s, {round_trips:.2f} DB round-trips per signup")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,148 @@
+import asyncio
+import inspect
+import json
+import platform
+import statistics
+import subprocess
+import time
+import uuid
+from datetime import datetime, timezone
+
+
+# in-process stand-ins, so the numbers only measure our own code
+
+class NullWebSocket:
+    async def accept(self):
+        pass
+
+    async def send_text(self, data):
+        pass
+
+
+class FakeUser:
+    id = uuid.uuid4()
+    username = "bench"
+    email = "bench@test.com"
+    is_active = True
+    created_at = datetime.now(timezone.utc)
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def all(self):
+        return self.rows
+
+    def scalars(self):
+        return self
+
+    def scalar_one_or_none(self):
+        return self.rows[0] if self.rows else None
+
+
+class FakeSession:
+    # AsyncSession stand-in: every execute() returns the same rows. With a
+    # latency, each round trip (statement or commit) waits that long, roughly
+    # one Postgres round trip; round trips are counted across all sessions.
+    round_trips = 0
+
+    def __init__(self, rows=(), latency: float = 0):
+        self.rows = list(rows)
+        self.latency = latency
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+    async def _round_trip(self):
+        FakeSession.round_trips += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def execute(self, statement, params=None):
+        await self._round_trip()
+        return FakeResult(self.rows)
+
+    async def commit(self):
+        await self._round_trip()
+
+
+class Result:
+    __slots__ = ("name", "iterations", "ops_per_sec", "p50_us", "p99_us")
+
+    def __init__(self, name: str, samples: list[int]):
+        samples = sorted(samples)
+        self.name = name
+        self.iterations = len(samples)
+        self.ops_per_sec = len(samples) / (sum(samples) / 1e9)
+        self.p50_us = statistics.median(samples) / 1000
+        self.p99_us = samples[min(len(samples) - 1, int(len(samples) * 0.99))] / 1000
+
+    def as_dict(self) -> dict:
+        return {
+            "iterations": self.iterations,
+            "ops_per_sec": round(self.ops_per_sec, 1),
+            "p50_us": round(self.p50_us, 2),
+            "p99_us": round(self.p99_us, 2),
+        }
+
+
+async def measure(name: str, fn, iterations: int = 1000, warmup: int = 50) -> Result:
+    # fn is called with no arguments and may be sync or async; every call is
+    # one sample, timed with perf_counter_ns
+    is_async = inspect.iscoroutinefunction(fn)
+    for _ in range(warmup):
+        await fn() if is_async else fn()
+
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter_ns()
+        if is_async:
+            await fn()
+        else:
+            fn()
+        samples.append(time.perf_counter_ns() - start)
+    return Result(name, samples)
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_report(path: str, results: list[Result]):
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": {r.name: r.as_dict() for r in results},
+    }
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+
+
+def print_results(results: list[Result], baseline_path: str | None = None):
+    baseline = {}
+    if baseline_path:
+        with open(baseline_path) as f:
+            baseline = json.load(f)["results"]
+
+    width = max(len(r.name) for r in results)
+    header = f"{'benchmark':<{width}} {'ops/s':>12} {'p50 (us)':>10} {'p99 (us)':>10}"
+    if baseline:
+        header += f" {'vs base':>9}"
+    print(header)
+    for r in results:
+        line = f"{r.name:<{width}} {r.ops_per_sec:>12.0f} {r.p50_us:>10.2f} {r.p99_us:>10.2f}"
+        if r.name in baseline:
+            change = r.ops_per_sec / baseline[r.name]["ops_per_sec"] - 1
+            line += f" {change:>+8.1%}"
+        print(line)
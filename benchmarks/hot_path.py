@@ -0,0 +1,99 @@
+# Real-time hot path cases for the benchmark suite. Everything runs in
+# process: sockets, DB sessions and rows are stand-ins, so the numbers only
+# measure our own code.
+import asyncio
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+import orjson
+from fastapi.security import HTTPAuthorizationCredentials
+from app.core import user_cache
+from app.core.dependencies import get_current_user
+from app.core.security import create_access_token
+from app.models.message import MessageType
+from app.services import room_service
+from app.websocket.manager import ConnectionManager
+from benchmarks.harness import FakeSession, FakeUser, NullWebSocket, measure
+
+MESSAGE = {
+    "type": "message",
+    "message_id": "6f1c2a9e-3a59-4c55-9d6e-2b0f1c9b7a10",
+    "room_id": "b2d6c1a4-8f3e-4a7c-9c1d-5e2f3a4b6c7d",
+    "sender_id": "0a9b8c7d-6e5f-4a3b-2c1d-0e9f8a7b6c5d",
+    "username": "tisha",
+    "content": "Deployed 5 mins ago 🚀",
+    "timestamp": "2026-03-07T18:35:37.047143+00:00",
+}
+
+
+class FakeMessage:
+    __slots__ = ("id", "room_id", "sender_id", "content", "message_type", "created_at")
+
+    def __init__(self, n: int):
+        self.id = uuid.uuid4()
+        self.room_id = uuid.UUID(MESSAGE["room_id"])
+        self.sender_id = FakeUser.id
+        self.content = f"message {n}"
+        self.message_type = MessageType.text
+        self.created_at = datetime(2026, 1, 1, tzinfo=timezone.utc) + timedelta(seconds=n)
+
+
+async def fan_out(room_size: int):
+    manager = ConnectionManager(send_queue_size=16)
+    for i in range(room_size):
+        await manager.connect(NullWebSocket(), "room", str(i), f"user{i}")
+
+    async def broadcast():
+        await manager.broadcast_to_room(MESSAGE, "room")
+        # one loop pass lets every writer task flush its frame
+        await asyncio.sleep(0)
+
+    result = await measure(f"broadcast fan-out x{room_size}", broadcast, iterations=200)
+    await manager.stop()
+    return result
+
+
+async def serialization():
+    return [
+        await measure("serialize json.dumps", lambda: json.dumps(MESSAGE, ensure_ascii=False), iterations=20000),
+        await measure("serialize orjson", lambda: orjson.dumps(MESSAGE).decode(), iterations=20000),
+    ]
+
+
+async def token_resolution():
+    credentials = HTTPAuthorizationCredentials(
+        scheme="Bearer", credentials=create_access_token({"sub": str(FakeUser.id)})
+    )
+    db = FakeSession([FakeUser])
+
+    async def cold():
+        user_cache.token_cache.clear()
+        user_cache.user_cache.clear()
+        await get_current_user(credentials, lambda: db)
+
+    async def warm():
+        await get_current_user(credentials, lambda: db)
+
+    return [
+        await measure("token + user (cold cache)", cold, iterations=5000),
+        await measure("token + user (warm cache)", warm, iterations=5000),
+    ]
+
+
+async def row_shaping(rows: int = 50):
+    db = FakeSession([(FakeMessage(n), "bench") for n in range(rows + 1)])
+
+    async def query():
+        await room_service._query_room_messages(MESSAGE["room_id"], db, rows)
+
+    return await measure(f"history page shaping x{rows}", query, iterations=2000)
+
+
+async def run_all():
+    results = []
+    for size in (10, 100, 1000):
+        results.append(await fan_out(size))
+    results.extend(await serialization())
+    results.extend(await token_resolution())
+    results.append(await row_shaping())
+    return results
@@ -4,4 +4,7 @@ export const getRooms = () => api.get('/rooms')
 export const createRoom = (data) => api.post('/rooms', data)
 export const joinRoom = (roomId) => api.post(`/rooms/${roomId}/join`)
 export const leaveRoom = (roomId) => api.post(`/rooms/${roomId}/leave`)
-export const getMessages = (roomId) => api.get(`/rooms/${roomId}/messages`)
\ No newline at end of file
+export const getMessages = (roomId, params) => api.get(`/rooms/${roomId}/messages`, { params })
+export const searchMessages = (params) => api.get('/search/messages', { params })
+export const getUnreadCounts = () => api.get('/rooms/unread')
+export const markRoomRead = (roomId) => api.post(`/rooms/${roomId}/read`)
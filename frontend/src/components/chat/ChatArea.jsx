@@ -56,7 +56,7 @@ export default function ChatArea({ onNewMessage }) {
     setShowEmojiPicker(false)
 
     getMessages(activeRoom.id)
-      .then(res => { setMessages(res.data.reverse()); setLoading(false) })
+      .then(res => { setMessages(res.data.messages.reverse()); setLoading(false) })
       .catch(() => setLoading(false))
 
     api.get('/users/online').then(res => setOnlineUsers(res.data)).catch(() => { })
@@ -66,15 +66,18 @@ export default function ChatArea({ onNewMessage }) {
 
     ws.onmessage = (e) => {
       const data = JSON.parse(e.data)
-      if (data.type === 'message') {
+      if (data.type === 'ping') {
+        ws.send(JSON.stringify({ type: 'pong' }))
+      } else if (data.type === 'message') {
         addMessage(data)
         setTyping(null)
         if (data.username !== user?.username && !notifMuted) {
           notify(`${data.username}`, data.content, data.username)
           onNewMessage?.({ username: data.username, message: data.content, room: activeRoom.name, roomId: activeRoom.id })
         }
-      } else if (data.type === 'typing') {
-        if (data.username !== user?.username) setTyping(data.is_typing ? data.username : null)
+      } else if (data.type === 'typing_state') {
+        const typers = data.typers.map(t => t.username).filter(name => name !== user?.username)
+        setTyping(typers.length ? typers.join(', ') : null)
       } else if (data.type === 'user_joined') {
         addMessage({ type: 'system', content: `${data.username} joined`, id: Date.now() })
       } else if (data.type === 'user_left') {
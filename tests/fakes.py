@@ -0,0 +1,168 @@
+import asyncio
+import itertools
+import json
+import uuid
+from fastapi import WebSocketDisconnect
+from sqlalchemy.dialects import postgresql
+
+# unit tests run against these fakes instead of Postgres, a live socket and
+# the clock; the Redis fakes are fixtures in conftest
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = list(rows)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def all(self):
+        return self.rows
+
+    def scalars(self):
+        return FakeResult(row[0] if isinstance(row, tuple) else row for row in self.rows)
+
+    def scalar_one_or_none(self):
+        return self.rows[0] if self.rows else None
+
+
+class FakeStreamResult:
+    # rows are pulled from the queued iterable one batch at a time, like a
+    # server-side cursor
+    def __init__(self, rows, batch_size: int):
+        self.rows = iter(rows)
+        self.batch_size = batch_size
+
+    async def partitions(self):
+        while batch := list(itertools.islice(self.rows, self.batch_size)):
+            yield batch
+
+
+class FakeSession:
+    # AsyncSession stand-in: each execute() or stream() returns the next
+    # queued result (the last one repeats) and is recorded along with its
+    # parameters
+    def __init__(self, *results):
+        self.results = list(results) or [[]]
+        self.executed = []
+        self.info = {}
+        self.commits = 0
+        self.rollbacks = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+    @property
+    def queries(self) -> int:
+        return len(self.executed)
+
+    def compiled(self, index: int = -1):
+        return self.executed[index][0].compile(dialect=postgresql.dialect())
+
+    def _next(self, statement, params):
+        self.executed.append((statement, params))
+        return self.results[min(self.queries, len(self.results)) - 1]
+
+    async def execute(self, statement, params=None):
+        return FakeResult(self._next(statement, params))
+
+    async def stream(self, statement, params=None):
+        rows = self._next(statement, params)
+        return FakeStreamResult(rows, statement.get_execution_options()["yield_per"])
+
+    async def commit(self):
+        self.commits += 1
+
+    async def rollback(self):
+        self.rollbacks += 1
+
+
+class FakeConnection:
+    # the sync side (Celery tasks, run_sync): a Session or an engine.begin()
+    # connection, queued and recorded like FakeSession
+    def __init__(self, *results):
+        self.results = list(results) or [[]]
+        self.executed = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    @property
+    def sql(self) -> list[str]:
+        return [str(statement) for statement, _ in self.executed]
+
+    def execute(self, statement, params=None):
+        self.executed.append((statement, params))
+        return FakeResult(self.results[min(len(self.executed), len(self.results)) - 1])
+
+
+class FakeUser:
+    # the User attributes the code under test reads
+    def __init__(self, id=None, username="alice", email=None, is_active=True):
+        self.id = id or uuid.uuid4()
+        self.username = username
+        self.email = email or f"{username}@test.com"
+        self.is_active = is_active
+        self.created_at = None
+
+
+class Clock:
+    # patched over a module's `time` to move time by hand
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+
+class FakeWebSocket:
+    def __init__(self, stalled=False):
+        self.sent = []
+        self.closed_with = None
+        # a stalled socket never completes a send, like a client that stopped reading
+        self.gate = asyncio.Event()
+        if not stalled:
+            self.gate.set()
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, data):
+        await self.gate.wait()
+        self.sent.append(json.loads(data))
+
+    async def close(self, code=1000):
+        self.closed_with = code
+
+
+class ScriptedWebSocket(FakeWebSocket):
+    # replays the given inbound frames, then disconnects
+    def __init__(self, frames):
+        super().__init__()
+        self.frames = list(frames)
+
+    async def receive_json(self):
+        if not self.frames:
+            raise WebSocketDisconnect()
+        return self.frames.pop(0)
+
+
+async def drain():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+async def wait_until(predicate, timeout=1.0):
+    async def poll():
+        while not predicate():
+            await asyncio.sleep(0.01)
+    await asyncio.wait_for(poll(), timeout)
@@ -0,0 +1,58 @@
+import gzip
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta, timezone
+import orjson
+import pytest
+from sqlalchemy.dialects import postgresql
+from app.models.message import MessageType
+from app.services.export_service import build_export_query, export_room_messages, gzip_stream
+from tests.fakes import FakeSession
+
+ROOM = str(uuid.uuid4())
+SENDER = uuid.uuid4()
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def message_rows(total: int):
+    # produced on demand, so only the batch being exported is ever alive
+    for n in range(total):
+        yield (uuid.uuid4(), SENDER, "alice", f"message number {n} " * 4, MessageType.text, START + timedelta(seconds=n))
+
+
+async def export_peak_memory(total: int) -> int:
+    tracemalloc.start()
+    rows = 0
+    async for chunk in export_room_messages(ROOM, session_factory=lambda: FakeSession(message_rows(total))):
+        rows += chunk.count(b"\n")
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert rows == total
+    return peak
+
+
+@pytest.mark.asyncio
+async def test_export_memory_stays_flat_as_the_room_grows():
+    small = await export_peak_memory(5_000)
+    large = await export_peak_memory(50_000)
+    # 10x the rows, roughly the same peak: only one batch is alive at a time
+    assert large < small * 1.5
+
+
+@pytest.mark.asyncio
+async def test_export_is_ndjson_oldest_first_and_can_be_gzipped():
+    session = FakeSession(message_rows(2_500))
+    chunks = [c async for c in gzip_stream(export_room_messages(ROOM, session_factory=lambda: session))]
+
+    lines = gzip.decompress(b"".join(chunks)).splitlines()
+    assert len(lines) == 2_500
+    first, last = orjson.loads(lines[0]), orjson.loads(lines[-1])
+    assert first["room_id"] == ROOM and first["username"] == "alice" and first["type"] == "text"
+    assert first["timestamp"] < last["timestamp"]
+    assert session.executed[0][0].get_execution_options()["yield_per"] == 1000
+
+
+def test_time_range_filter():
+    sql = str(build_export_query(ROOM, START, START + timedelta(days=1)).compile(dialect=postgresql.dialect()))
+    assert "messages.created_at >= " in sql and "messages.created_at < " in sql
+    assert sql.endswith("ORDER BY messages.created_at ASC, messages.id ASC")
@@ -0,0 +1,61 @@
+import pytest
+from app.services import membership_service
+from tests.fakes import FakeSession
+
+
+@pytest.fixture
+def db(monkeypatch, redis):
+    db = FakeSession(["u1", "u2"])
+    monkeypatch.setattr(membership_service, "redis_client", redis)
+    monkeypatch.setattr(membership_service, "AsyncSessionLocal", lambda: db)
+    return db
+
+
+@pytest.mark.asyncio
+async def test_membership_is_loaded_once_then_served_from_redis(db):
+    assert await membership_service.is_member("room-1", "u1")
+    assert await membership_service.is_member("room-1", "u2")
+    assert not await membership_service.is_member("room-1", "u3")
+    assert db.queries == 1
+
+
+@pytest.mark.asyncio
+async def test_join_and_leave_update_the_cache(db):
+    assert not await membership_service.is_member("room-1", "u3")
+
+    await membership_service.add_member("room-1", "u3")
+    assert await membership_service.is_member("room-1", "u3")
+
+    await membership_service.remove_member("room-1", "u1")
+    assert not await membership_service.is_member("room-1", "u1")
+    assert db.queries == 1
+
+
+@pytest.mark.asyncio
+async def test_writes_to_a_cold_room_do_not_hide_other_members(db):
+    await membership_service.add_to_rooms("u3", ["room-1", "room-2"])
+
+    # the set exists but was never loaded, so it is filled from the DB first
+    assert await membership_service.is_member("room-1", "u1")
+    assert await membership_service.is_member("room-1", "u3")
+    assert db.queries == 1
+
+
+@pytest.mark.asyncio
+async def test_a_removal_during_a_load_is_not_undone(monkeypatch, redis):
+    class RacingSession(FakeSession):
+        async def execute(self, statement, params=None):
+            result = await super().execute(statement, params)
+            if self.queries == 1:
+                # u2 leaves after the read but before the set is written
+                await membership_service.remove_member("room-1", "u2")
+            return result
+
+    db = RacingSession(["u1", "u2"], ["u1"])
+    monkeypatch.setattr(membership_service, "redis_client", redis)
+    monkeypatch.setattr(membership_service, "AsyncSessionLocal", lambda: db)
+
+    assert not await membership_service.is_member("room-1", "u2")
+    assert await membership_service.is_member("room-1", "u1")
+    assert db.queries == 2
+    assert await redis.smembers(membership_service.members_key("room-1")) == {membership_service.LOADED, "u1"}
@@ -0,0 +1,110 @@
+import pytest
+from prometheus_client import REGISTRY
+from app.services import room_service
+from app.services.message_cache import MessageCache
+
+
+def make_message(n):
+    return {
+        "id": f"00000000-0000-0000-0000-{n:012d}",
+        "content": f"msg {n}",
+        "username": "alice",
+        "sender_id": "u1",
+        "room_id": "room-1",
+        "timestamp": f"2026-01-01T00:{n // 60:02d}:{n % 60:02d}+00:00",
+        "type": "text",
+    }
+
+
+@pytest.fixture
+def cache(redis):
+    return MessageCache(redis, size=5)
+
+
+def cache_requests(result: str) -> float:
+    return REGISTRY.get_sample_value("message_cache_requests_total", {"result": result}) or 0
+
+
+@pytest.mark.asyncio
+async def test_cold_rooms_are_only_served_after_a_fill(cache):
+    hits, misses = cache_requests("hit"), cache_requests("miss")
+    # sent while the room is cold and before the writer flushed it: Postgres
+    # doesn't have it yet, but the fill keeps it
+    await cache.push("room-1", make_message(3))
+    assert await cache.get("room-1", 5) is None
+
+    filled = await cache.fill("room-1", [make_message(2), make_message(1)])
+    assert [m["content"] for m in filled] == ["msg 3", "msg 2", "msg 1"]
+    await cache.push("room-1", make_message(4))
+    assert [m["content"] for m in await cache.get("room-1", 5)] == ["msg 4", "msg 3", "msg 2", "msg 1"]
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert (cache_requests("hit") - hits, cache_requests("miss") - misses) == (1, 1)
+
+
+@pytest.mark.asyncio
+async def test_a_push_during_a_fill_is_not_overwritten(cache, redis, monkeypatch):
+    pipeline = type(redis.pipeline())
+    lrange = pipeline.lrange
+    raced = []
+
+    async def racing_lrange(pipe, *args):
+        # another worker sends right after the fill read the list
+        frames = await lrange(pipe, *args)
+        if not raced:
+            raced.append(True)
+            await cache.push("room-1", make_message(3))
+        return frames
+
+    monkeypatch.setattr(pipeline, "lrange", racing_lrange)
+    await cache.fill("room-1", [make_message(2), make_message(1)])
+    monkeypatch.undo()
+    assert [m["content"] for m in await cache.get("room-1", 5)] == ["msg 3", "msg 2", "msg 1"]
+
+
+@pytest.mark.asyncio
+async def test_reads_are_ordered_and_deduplicated(cache):
+    await cache.fill("room-1", [make_message(2), make_message(1)])
+    # pushed by two workers out of order, one of them already filled from Postgres
+    await cache.push("room-1", make_message(4))
+    await cache.push("room-1", make_message(3))
+    await cache.push("room-1", make_message(2))
+    assert [m["content"] for m in await cache.get("room-1", 5)] == ["msg 4", "msg 3", "msg 2", "msg 1"]
+
+
+@pytest.mark.asyncio
+async def test_rows_the_writer_could_not_persist_are_discarded(cache):
+    await cache.fill("room-1", [make_message(2), make_message(1)])
+    await cache.push("room-1", make_message(3))
+    await cache.discard([{"id": make_message(3)["id"], "room_id": "room-1"}, {"id": "gone", "room_id": "room-2"}])
+    assert [m["content"] for m in await cache.get("room-1", 5)] == ["msg 2", "msg 1"]
+
+
+@pytest.mark.asyncio
+async def test_cache_is_capped_and_invalidated(cache):
+    await cache.fill("room-1", [make_message(1)])
+    for n in range(2, 10):
+        await cache.push("room-1", make_message(n))
+    assert [m["content"] for m in await cache.get("room-1", 10)] == [f"msg {n}" for n in range(9, 4, -1)]
+
+    await cache.invalidate("room-1")
+    assert await cache.get("room-1", 10) is None
+
+
+@pytest.mark.asyncio
+async def test_history_falls_back_to_db_on_miss(cache, monkeypatch):
+    calls = []
+
+    async def fake_query(room_id, db, limit, before=None, after=None):
+        calls.append(limit)
+        return {"messages": [make_message(n) for n in range(4, 0, -1)], "next_cursor": None}
+
+    monkeypatch.setattr(room_service, "message_cache", cache)
+    monkeypatch.setattr(room_service, "_query_room_messages", fake_query)
+
+    first = await room_service.get_room_messages("room-1", db=None, limit=2)
+    second = await room_service.get_room_messages("room-1", db=None, limit=2)
+
+    assert calls == [5]
+    assert first == second
+    assert [m["content"] for m in first["messages"]] == ["msg 4", "msg 3"]
+    assert room_service.decode_cursor(first["next_cursor"])[1].int == 3
@@ -0,0 +1,125 @@
+import asyncio
+import uuid
+import pytest
+from sqlalchemy.exc import IntegrityError
+from app.services.message_writer import MessageWriter
+from tests.fakes import FakeResult, FakeSession
+
+
+class WriterSession(FakeSession):
+    def __init__(self, batches, bad_ids=()):
+        super().__init__()
+        self.batches = batches
+        self.bad_ids = set(bad_ids)
+
+    async def execute(self, statement, rows):
+        # like Postgres, one bad row fails the whole multi-row INSERT
+        if any(row["id"] in self.bad_ids for row in rows):
+            raise IntegrityError("INSERT", {}, Exception("violates foreign key constraint"))
+        self.batches.append(list(rows))
+        await super().execute(statement, rows)
+        return FakeResult(rows)
+
+
+def make_row(n):
+    return {"id": uuid.uuid4(), "room_id": "room-1", "sender_id": "u1", "content": f"msg {n}"}
+
+
+@pytest.mark.asyncio
+async def test_rows_are_inserted_in_batches():
+    batches = []
+    writer = MessageWriter(
+        session_factory=lambda: WriterSession(batches),
+        batch_size=10,
+        flush_interval=0.05,
+    )
+    for n in range(25):
+        await writer.enqueue(make_row(n))
+    await writer.start()
+    await writer.stop()
+
+    assert [len(batch) for batch in batches] == [10, 10, 5]
+    assert writer.inserted == 25
+
+
+@pytest.mark.asyncio
+async def test_partial_batch_is_flushed_after_interval():
+    batches = []
+    writer = MessageWriter(
+        session_factory=lambda: WriterSession(batches),
+        batch_size=100,
+        flush_interval=0.01,
+    )
+    await writer.start()
+    await writer.enqueue(make_row(1))
+    await asyncio.sleep(0.05)
+
+    assert len(batches) == 1
+    await writer.stop()
+
+
+@pytest.mark.asyncio
+async def test_stop_flushes_queue_and_rejects_new_rows():
+    batches = []
+    writer = MessageWriter(
+        session_factory=lambda: WriterSession(batches),
+        batch_size=100,
+        flush_interval=10,
+    )
+    await writer.start()
+    for n in range(3):
+        await writer.enqueue(make_row(n))
+    await writer.stop()
+
+    assert sum(len(batch) for batch in batches) == 3
+    with pytest.raises(RuntimeError):
+        await writer.enqueue(make_row(4))
+
+
+@pytest.mark.asyncio
+async def test_bad_rows_are_split_out_of_the_batch():
+    batches, persisted = [], []
+
+    async def on_persisted(rows):
+        persisted.extend(rows)
+
+    rows = [make_row(n) for n in range(10)]
+    bad_ids = {rows[3]["id"], rows[7]["id"]}
+    writer = MessageWriter(
+        session_factory=lambda: WriterSession(batches, bad_ids),
+        batch_size=10,
+        flush_interval=0.05,
+        on_persisted=[on_persisted],
+    )
+    for row in rows:
+        await writer.enqueue(row)
+    await writer.start()
+    await writer.stop()
+
+    # only the two offending rows are lost, and nothing is retried blindly
+    assert writer.inserted == 8
+    assert writer.rejected == 2
+    assert writer.failed == 0
+    assert {row["id"] for row in persisted} == {row["id"] for row in rows} - bad_ids
+
+
+@pytest.mark.asyncio
+async def test_failed_rows_are_reported():
+    failed = []
+
+    async def on_failed(rows):
+        failed.extend(rows)
+
+    rows = [make_row(n) for n in range(4)]
+    writer = MessageWriter(
+        session_factory=lambda: WriterSession([], {rows[1]["id"]}),
+        batch_size=10,
+        flush_interval=0.05,
+        on_failed=[on_failed],
+    )
+    for row in rows:
+        await writer.enqueue(row)
+    await writer.start()
+    await writer.stop()
+
+    assert failed == [rows[1]]
@@ -0,0 +1,78 @@
+import httpx
+import pytest
+from prometheus_client import REGISTRY
+from starlette.requests import Request
+from app.core.metrics import RuntimeCollector
+from app.main import app, record_latency
+from app.websocket.manager import ConnectionManager
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_exposes_hot_path_series():
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        await client.get("/health")
+        res = await client.get("/metrics")
+
+    assert res.status_code == 200
+    body = res.text
+    for name in (
+        "ws_active_sockets",
+        "ws_broadcast_duration_seconds",
+        "message_persist_duration_seconds",
+        "redis_command_duration_seconds",
+        "db_pool_checked_out",
+        "db_pool_overflow",
+        "password_hash_queue_depth",
+    ):
+        assert name in body
+    assert 'http_request_duration_seconds_count{method="GET",route="/health",status="200"}' in body
+
+
+@pytest.mark.asyncio
+async def test_broadcast_is_timed():
+    count = REGISTRY.get_sample_value("ws_broadcast_duration_seconds_count")
+    await ConnectionManager().broadcast_to_room({"type": "message"}, "room-1")
+    assert REGISTRY.get_sample_value("ws_broadcast_duration_seconds_count") == count + 1
+
+
+def test_room_sizes_are_a_histogram_and_pools_are_labelled_by_engine():
+    class Pool:
+        def checkedout(self):
+            return 3
+
+        def overflow(self):
+            return 0
+
+        def size(self):
+            return 5
+
+    class Engine:
+        pool = Pool()
+
+    manager = ConnectionManager()
+    manager.active_connections = {"room-1": {1: None, 2: None, 3: None}, "room-2": {4: None}}
+    hasher = type("Hasher", (), {"rejected": 0})()
+    metrics = {m.name: m for m in RuntimeCollector(manager, {"primary": Engine(), "replica": Engine()}, hasher).collect()}
+
+    samples = {(s.name, s.labels.get("le")): s.value for s in metrics["ws_room_sockets"].samples}
+    assert samples[("ws_room_sockets_bucket", "1")] == 1
+    assert samples[("ws_room_sockets_bucket", "5")] == 2
+    assert samples[("ws_room_sockets_count", None)] == 2
+    assert samples[("ws_room_sockets_sum", None)] == 4
+    assert {s.labels["engine"]: s.value for s in metrics["db_pool_checked_out"].samples} == {"primary": 3, "replica": 3}
+
+
+@pytest.mark.asyncio
+async def test_failed_requests_are_timed_as_500():
+    route = type("Route", (), {"path": "/boom"})()
+    request = Request({"type": "http", "method": "GET", "path": "/boom", "headers": [], "route": route})
+
+    async def call_next(request):
+        raise RuntimeError("boom")
+
+    labels = {"method": "GET", "route": "/boom", "status": "500"}
+    count = REGISTRY.get_sample_value("http_request_duration_seconds_count", labels) or 0
+    with pytest.raises(RuntimeError):
+        await record_latency(request, call_next)
+    assert REGISTRY.get_sample_value("http_request_duration_seconds_count", labels) == count + 1
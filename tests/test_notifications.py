@@ -0,0 +1,109 @@
+import pytest
+import uuid
+from app.services import membership_service, notification_service, presence_service, unread_service
+from app.services.membership_service import LOADED
+from app.tasks import notifications
+from tests.fakes import FakeConnection
+
+ROOM = str(uuid.uuid4())
+ALICE, BOB, CAROL = (str(uuid.uuid4()) for _ in range(3))
+NAMES = {ALICE: "alice"}
+
+
+@pytest.fixture
+def redis(monkeypatch, redis, redis_sync):
+    monkeypatch.setattr(notification_service, "redis_client", redis)
+    monkeypatch.setattr(presence_service, "redis_client", redis)
+    monkeypatch.setattr(unread_service, "redis_client", redis)
+    monkeypatch.setattr(notifications, "redis_sync", redis_sync)
+    monkeypatch.setattr(notifications, "_lookup", lambda user_ids, room_ids: (
+        {u: (f"{u}@test.com", NAMES.get(u, u[:8])) for u in user_ids},
+        {r: "general" for r in room_ids},
+    ))
+    return redis
+
+
+@pytest.fixture
+def queued(monkeypatch):
+    calls = []
+    monkeypatch.setattr(notifications.send_digest_notification, "delay", lambda *args: calls.append(args))
+    return calls
+
+
+def messages(sender_id, *contents):
+    return [{"id": uuid.uuid4(), "room_id": ROOM, "sender_id": sender_id, "content": c} for c in contents]
+
+
+async def persist(rows):
+    # what the message writer's hooks do with a committed batch
+    await unread_service.record_persisted(rows)
+    await notification_service.record_missed_messages(rows)
+
+
+@pytest.mark.asyncio
+async def test_offline_members_get_one_digest_per_window(redis, queued):
+    await redis.sadd(membership_service.members_key(ROOM), LOADED, ALICE, BOB, CAROL)
+    await presence_service.set_online(ALICE, "alice")
+
+    # two writer batches
+    await persist(messages(ALICE, *(f"message {n}" for n in range(15))))
+    await persist(messages(ALICE, *(f"message {n}" for n in range(15, 20))))
+
+    assert notifications.send_notification_digests() == {"sent": 2}
+    assert {call[0] for call in queued} == {f"{BOB}@test.com", f"{CAROL}@test.com"}
+    email, username, rooms = queued[0]
+    assert rooms == [{
+        "room_id": ROOM, "room_name": "general", "count": 20,
+        "last_username": "alice", "last_preview": "message 19",
+    }]
+
+    # the window is drained; nothing new means nothing is sent
+    assert notifications.send_notification_digests() == {"sent": 0}
+    assert len(queued) == 2
+
+
+@pytest.mark.asyncio
+async def test_read_and_own_messages_are_not_counted(redis, queued):
+    await redis.sadd(membership_service.members_key(ROOM), LOADED, ALICE, BOB, CAROL)
+    await persist(messages(ALICE, *(f"message {n}" for n in range(5))))
+    await unread_service.mark_read(BOB, ROOM)
+    await persist(messages(CAROL, "reply 1", "reply 2"))
+
+    assert notifications.send_notification_digests() == {"sent": 2}
+    counts = {email.split("@")[0]: rooms[0]["count"] for email, _, rooms in queued}
+    # ALICE wrote the first five and BOB read them; CAROL wrote the replies
+    assert counts == {ALICE: 2, BOB: 2}
+
+
+@pytest.mark.asyncio
+async def test_cold_member_sets_fall_back_to_postgres(redis, queued, monkeypatch):
+    # not loaded into Redis: the room is not skipped, its members come from Postgres
+    await redis.sadd(membership_service.members_key(ROOM), BOB)
+    monkeypatch.setattr(notifications, "Session", lambda engine: FakeConnection([
+        (uuid.UUID(ROOM), uuid.UUID(ALICE)), (uuid.UUID(ROOM), uuid.UUID(CAROL)),
+    ]))
+    await persist(messages(ALICE, "hi"))
+
+    assert notifications.send_notification_digests() == {"sent": 1}
+    assert queued[0][0] == f"{CAROL}@test.com"
+
+
+@pytest.mark.asyncio
+async def test_users_back_online_are_skipped(redis, queued):
+    await redis.sadd(membership_service.members_key(ROOM), LOADED, ALICE, BOB)
+    await persist(messages(ALICE, "hi"))
+    await presence_service.set_online(BOB, "bob")
+
+    assert notifications.send_notification_digests() == {"sent": 0}
+
+
+@pytest.mark.asyncio
+async def test_a_batch_costs_the_same_however_many_members(redis, queued):
+    members = [str(uuid.uuid4()) for _ in range(500)]
+    await redis.sadd(membership_service.members_key(ROOM), LOADED, *members)
+    await notification_service.record_missed_messages(messages(ALICE, *(f"message {n}" for n in range(10))))
+
+    # one counter and one "last" entry for the room, nothing per member
+    assert await redis.hgetall(notification_service.ROOMS_KEY) == {ROOM: "10"}
+    assert notification_service.parse_last(await redis.hget(notification_service.LAST_KEY, ROOM)) == (ALICE, "message 9")
+    assert await redis.dbsize() == 3
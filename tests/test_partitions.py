@@ -0,0 +1,71 @@
+import uuid
+from datetime import date, datetime, timezone
+import pytest
+from app.db.partitions import (
+    add_months, create_partition_sql, ensure_current_partitions, partition_month, partition_name,
+)
+from app.models.message import Message
+from app.services import room_service
+from app.tasks.partitions import partitions_to_archive
+from tests.fakes import FakeConnection, FakeSession
+
+
+def test_monthly_partition_names_and_bounds():
+    assert add_months(date(2026, 11, 1), 2) == date(2027, 1, 1)
+    assert add_months(date(2026, 1, 1), -1) == date(2025, 12, 1)
+    assert partition_name(date(2026, 3, 1)) == "messages_2026_03"
+    assert partition_month("messages_2026_03") == date(2026, 3, 1)
+    assert partition_month("messages_default") is None
+
+    assert create_partition_sql(date(2026, 12, 1)) == (
+        "CREATE TABLE IF NOT EXISTS messages_2026_12 PARTITION OF messages "
+        "FOR VALUES FROM ('2026-12-01 00:00+00') TO ('2027-01-01 00:00+00')"
+    )
+
+
+def test_only_months_past_retention_are_archived():
+    partitions = ["messages_2026_10", "messages_2025_09", "messages_2025_11", "messages_2025_10", "messages_default"]
+    this_month = date(2026, 10, 1)
+    assert partitions_to_archive(partitions, this_month, 0) == []
+    assert partitions_to_archive(partitions, this_month, 12) == ["messages_2025_09"]
+    assert partitions_to_archive(partitions, this_month, 11) == ["messages_2025_09", "messages_2025_10"]
+
+
+def test_message_table_is_partitioned_by_created_at():
+    assert Message.__table__.dialect_options["postgresql"]["partition_by"] == "RANGE (created_at)"
+    assert [c.name for c in Message.__table__.primary_key] == ["id", "created_at"]
+
+
+class PartitionConnection(FakeConnection):
+    # sync connection as handed over by run_sync; CREATE TABLE adds a partition
+    def __init__(self, existing=()):
+        self.partitions = list(existing)
+        super().__init__(self.partitions)
+
+    def execute(self, statement, params=None):
+        sql = str(statement)
+        if sql.startswith("CREATE TABLE") and "PARTITION OF" in sql:
+            self.partitions.append(sql.split()[5])
+        return super().execute(statement, params)
+
+
+def test_startup_creates_the_forward_window():
+    conn = PartitionConnection()
+    ensure_current_partitions(conn, 2, today=date(2026, 11, 30))
+    assert "pg_advisory_xact_lock" in conn.sql[0]
+    assert conn.partitions == ["messages_2026_11", "messages_2026_12", "messages_2027_01"]
+
+
+def test_startup_fails_without_a_partition_for_this_month():
+    # CREATE TABLE doesn't attach anything, e.g. a same-named table that isn't
+    # a partition of messages
+    with pytest.raises(RuntimeError, match="2026-11"):
+        ensure_current_partitions(FakeConnection(["messages_2026_10"]), 2, today=date(2026, 11, 30))
+
+
+@pytest.mark.asyncio
+async def test_history_cursors_bound_created_at_for_partition_pruning():
+    db = FakeSession()
+    cursor = room_service.encode_cursor(datetime.now(timezone.utc), uuid.uuid4())
+    await room_service._query_room_messages(str(uuid.uuid4()), db, 50, before=cursor)
+    assert "messages.created_at <= " in str(db.compiled())
@@ -0,0 +1,86 @@
+import pytest
+from app.api.v1 import chat
+from app.services import presence_service
+from app.websocket.manager import ConnectionManager
+from tests.fakes import FakeWebSocket
+
+
+@pytest.fixture(autouse=True)
+def setup(monkeypatch, clock, redis):
+    monkeypatch.setattr(presence_service, "redis_client", redis)
+    monkeypatch.setattr(presence_service, "time", clock)
+
+
+@pytest.mark.asyncio
+async def test_online_users_and_room_view(clock):
+    await presence_service.set_online("u1", "alice", "room-1")
+    await presence_service.set_online("u2", "bob", "room-2")
+
+    assert sorted(u["username"] for u in await presence_service.get_online_users()) == ["alice", "bob"]
+    assert await presence_service.get_room_online_users("room-1") == [{"user_id": "u1", "username": "alice"}]
+    assert await presence_service.is_user_online("u2")
+
+    await presence_service.set_offline("u2", "room-2")
+    assert await presence_service.get_room_online_users("room-2") == []
+    assert not await presence_service.is_user_online("u2")
+
+
+@pytest.mark.asyncio
+async def test_presence_expires_by_score_unless_refreshed(clock):
+    await presence_service.set_online("u1", "alice", "room-1")
+    await presence_service.set_online("u2", "bob", "room-1")
+
+    clock.now += 45
+    await presence_service.refresh_presence_many([("u1", "alice", "room-1")])
+    clock.now += 45
+
+    assert await presence_service.get_online_users() == [{"user_id": "u1", "username": "alice"}]
+    assert await presence_service.get_room_online_users("room-1") == [{"user_id": "u1", "username": "alice"}]
+    assert await presence_service.redis_client.hget(presence_service.USERNAMES_KEY, "u2") is None
+
+
+@pytest.mark.asyncio
+async def test_refresh_many_keeps_live_connections_online(clock):
+    await presence_service.set_online("u1", "alice", "room-1")
+    await presence_service.set_online("u2", "bob", "room-2")
+
+    clock.now += 45
+    await presence_service.refresh_presence_many([("u1", "alice", "room-1"), ("u2", "bob", "room-2")])
+    clock.now += 45
+
+    assert len(await presence_service.get_online_users()) == 2
+    assert await presence_service.get_room_online_users("room-2") == [{"user_id": "u2", "username": "bob"}]
+
+
+@pytest.mark.asyncio
+async def test_closing_one_of_several_tabs_keeps_the_user_online(monkeypatch):
+    manager = ConnectionManager()
+    monkeypatch.setattr(chat, "manager", manager)
+    tabs = [FakeWebSocket(), FakeWebSocket()]
+    for ws in tabs:
+        await manager.register(ws, "u1", "alice")
+        manager.subscribe(ws, "room-1")
+    await presence_service.set_online("u1", "alice", "room-1")
+
+    manager.disconnect(tabs[0])
+    await chat.release_presence("u1", ["room-1"], disconnected=True)
+    assert await presence_service.is_user_online("u1")
+    assert await presence_service.get_room_online_users("room-1") == [{"user_id": "u1", "username": "alice"}]
+
+    manager.disconnect(tabs[1])
+    await chat.release_presence("u1", ["room-1"], disconnected=True)
+    assert not await presence_service.is_user_online("u1")
+    assert await presence_service.get_room_online_users("room-1") == []
+    await manager.stop()
+
+
+@pytest.mark.asyncio
+async def test_heartbeat_puts_back_a_user_removed_by_another_worker(clock):
+    # u1 has sockets on two workers; closing the one on the other worker
+    # took them offline there
+    await presence_service.set_online("u1", "alice", "room-1")
+    await presence_service.set_offline("u1", "room-1")
+
+    await presence_service.refresh_presence_many([("u1", "alice", "room-1")])
+    assert await presence_service.is_user_online("u1")
+    assert await presence_service.get_room_online_users("room-1") == [{"user_id": "u1", "username": "alice"}]
@@ -0,0 +1,112 @@
+import pytest
+import uuid
+from fastapi import WebSocketDisconnect
+from app.api.v1 import chat
+from app.websocket import rate_limit
+from app.websocket.rate_limit import FrameLimiter
+from tests.fakes import FakeUser, FakeWebSocket, ScriptedWebSocket
+
+
+@pytest.fixture(autouse=True)
+def frozen_time(monkeypatch, clock):
+    monkeypatch.setattr(rate_limit, "time", clock)
+
+
+def make_limiter() -> FrameLimiter:
+    return FrameLimiter(
+        socket_limits={"message": (1, 3)},
+        user_limits={"message": (2, 4)},
+    )
+
+
+def test_socket_bucket_allows_a_burst_then_refills(clock):
+    limiter = make_limiter()
+    ws = object()
+    limiter.add(ws, "u1")
+
+    assert [limiter.allow(ws, "u1", "message") for _ in range(4)] == [True, True, True, False]
+    assert limiter.limited == {"socket": 1, "user": 0}
+
+    clock.now += 1
+    assert limiter.allow(ws, "u1", "message")
+    assert not limiter.allow(ws, "u1", "message")
+
+    # no bucket configured for this kind
+    assert limiter.allow(ws, "u1", "reaction")
+
+
+def test_user_bucket_is_shared_by_all_of_a_users_sockets(clock):
+    limiter = make_limiter()
+    first, second = object(), object()
+    limiter.add(first, "u1")
+    limiter.add(second, "u1")
+
+    assert [limiter.allow(first, "u1", "message") for _ in range(3)] == [True, True, True]
+    # the second socket still has tokens, but the user has only one left
+    assert limiter.allow(second, "u1", "message")
+    assert not limiter.allow(second, "u1", "message")
+    assert limiter.limited["user"] == 1
+
+    limiter.discard(first, "u1")
+    assert "u1" in limiter.users
+    limiter.discard(second, "u1")
+    assert limiter.users == {} and limiter.sockets == {}
+
+
+@pytest.mark.asyncio
+async def test_close_policy_disconnects_the_flooder(clock, monkeypatch):
+    limiter = FrameLimiter(socket_limits={"message": (1, 1)}, user_limits={})
+    monkeypatch.setattr(chat, "frame_limiter", limiter)
+    monkeypatch.setattr(chat.settings, "WS_RATE_LIMIT_POLICY", "close")
+    ws = FakeWebSocket()
+    user = FakeUser("u1")
+    limiter.add(ws, "u1")
+
+    assert await chat.allow_frame(ws, user, "message", "room-1")
+    with pytest.raises(WebSocketDisconnect):
+        await chat.allow_frame(ws, user, "message", "room-1")
+    assert ws.closed_with == 1008
+
+
+@pytest.mark.asyncio
+async def test_blank_messages_do_not_use_up_the_budget(monkeypatch):
+    room_id = str(uuid.uuid4())
+    sent, typing = [], []
+
+    async def noop(*args, **kwargs):
+        pass
+
+    async def is_member(room_id, user_id):
+        return True
+
+    async def send_chat_message(user, room_id, content):
+        sent.append(content)
+
+    async def send_typing(user, room_id, is_typing):
+        typing.append(is_typing)
+
+    async def get_user(token):
+        return FakeUser("u1")
+
+    monkeypatch.setattr(chat, "frame_limiter", FrameLimiter(socket_limits={"message": (1, 1), "typing": (1, 1)}, user_limits={}))
+    monkeypatch.setattr(chat, "get_user_from_token", get_user)
+    monkeypatch.setattr(chat, "is_member", is_member)
+    for name in ("join_room_channel", "leave_room_channel", "release_presence"):
+        monkeypatch.setattr(chat, name, noop)
+    monkeypatch.setattr(chat, "send_chat_message", send_chat_message)
+    monkeypatch.setattr(chat, "send_typing", send_typing)
+
+    ws = ScriptedWebSocket([
+        {"type": "subscribe", "room_id": room_id},
+        {"type": "message", "room_id": room_id, "content": ""},
+        {"type": "message", "room_id": room_id, "content": "   "},
+        {"type": "message", "room_id": room_id, "content": "hi"},
+        {"type": "message", "room_id": room_id, "content": "again"},
+        {"type": "typing", "room_id": room_id, "is_typing": True},
+        {"type": "typing", "room_id": room_id, "is_typing": True},
+    ])
+    await chat.multiplexed_endpoint(ws, token="t")
+
+    # blank frames are dropped before the limiter; typing frames still pay
+    assert sent == ["hi"]
+    assert typing == [True]
@@ -0,0 +1,92 @@
+import uuid
+import pytest
+from fastapi.security import HTTPAuthorizationCredentials
+from starlette.requests import Request
+from app.core import user_cache
+from app.core.dependencies import get_current_user
+from app.core.security import create_access_token
+from app.core.user_cache import CachedUser
+from app.db import session as db_session
+from tests.fakes import FakeSession
+
+
+def make_session(name: str, wrote: bool = False) -> FakeSession:
+    session = FakeSession()
+    session.name = name
+    if wrote:
+        session.info["wrote"] = True
+    return session
+
+
+def make_request(user_id: str | None = None) -> Request:
+    headers = []
+    if user_id:
+        headers.append((b"authorization", f"Bearer {create_access_token({'sub': user_id})}".encode()))
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+
+@pytest.fixture
+def routing(monkeypatch, redis):
+    # one Postgres behind two URLs is enough: routing only cares that the engines differ
+    monkeypatch.setattr(db_session, "replica_engine", object())
+    monkeypatch.setattr(db_session, "redis_client", redis)
+    monkeypatch.setattr(db_session, "AsyncSessionLocal", lambda: make_session("primary", wrote=True))
+    monkeypatch.setattr(db_session, "ReplicaSessionLocal", lambda: make_session("replica"))
+
+
+async def read_session(request: Request) -> FakeSession:
+    dependency = db_session.get_read_db(request)
+    session = await anext(dependency)
+    await dependency.aclose()
+    return session
+
+
+@pytest.mark.asyncio
+async def test_reads_go_to_the_replica_until_the_user_writes(routing):
+    request = make_request("u1")
+    assert (await read_session(request)).name == "replica"
+
+    dependency = db_session.get_db(request)
+    write = await anext(dependency)
+    assert write.name == "primary"
+    with pytest.raises(StopAsyncIteration):
+        await anext(dependency)
+
+    # read-your-writes: this user is pinned to the primary, others are not
+    assert (await read_session(request)).name == "primary"
+    assert (await read_session(make_request("u2"))).name == "replica"
+    assert (await read_session(make_request())).name == "replica"
+    assert await db_session.redis_client.ttl("recent_writer:u1") <= db_session.settings.READ_YOUR_WRITES_WINDOW
+
+
+@pytest.mark.asyncio
+async def test_without_a_replica_everything_uses_the_primary(routing, monkeypatch):
+    monkeypatch.setattr(db_session, "replica_engine", db_session.engine)
+    assert (await read_session(make_request("u1"))).name == "primary"
+    await db_session.mark_recent_writer("u1")
+    assert not await db_session.redis_client.exists("recent_writer:u1")
+
+
+@pytest.mark.asyncio
+async def test_current_user_routes_a_read_only_on_a_cache_miss(routing, monkeypatch):
+    user = CachedUser(uuid.uuid4(), "alice", "alice@test.com", True, None)
+    user_id = str(user.id)
+    user_cache.user_cache.pop(user_id)
+    monkeypatch.setattr(db_session, "ReplicaSessionLocal", lambda: FakeSession([user]))
+
+    routed = []
+    read_session_factory = db_session.read_session_factory
+
+    async def counting_factory(request):
+        routed.append(request)
+        return await read_session_factory(request)
+
+    monkeypatch.setattr(db_session, "read_session_factory", counting_factory)
+
+    request = make_request(user_id)
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=create_access_token({"sub": user_id}))
+    for _ in range(3):
+        current = await get_current_user(credentials, await db_session.get_read_session_opener(request))
+        assert current.id == user.id
+    # only the first call missed the user cache; the others cost no Redis lookup
+    assert len(routed) == 1
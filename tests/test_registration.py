@@ -0,0 +1,75 @@
+import uuid
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.exc import IntegrityError
+from app.models.room import RoomRole
+from app.schemas.user import UserRegister
+from app.services import auth_service, membership_service, room_service
+from tests.fakes import FakeSession
+
+PUBLIC_SERVERS = [uuid.uuid4(), uuid.uuid4(), uuid.uuid4()]
+
+
+class SignupSession(FakeSession):
+    def __init__(self, duplicate=False):
+        super().__init__(PUBLIC_SERVERS)
+        self.duplicate = duplicate
+
+    async def execute(self, statement, params=None):
+        result = await super().execute(statement, params)
+        if self.duplicate and "INSERT INTO room_members" in str(self.compiled()):
+            raise IntegrityError("INSERT", {}, Exception("duplicate key"))
+        return result
+
+
+@pytest.fixture(autouse=True)
+def setup(monkeypatch, redis):
+    async def fast_hash(password):
+        return "hashed:" + password
+
+    monkeypatch.setattr(auth_service, "hash_password", fast_hash)
+    monkeypatch.setattr(membership_service, "redis_client", redis)
+    room_service.public_server_cache.clear()
+
+
+def signup(n: int) -> UserRegister:
+    return UserRegister(username=f"user{n}", email=f"user{n}@test.com", password="password123")
+
+
+@pytest.mark.asyncio
+async def test_registration_is_one_statement_once_public_servers_are_cached():
+    first = SignupSession()
+    await auth_service.register_user(signup(1), first)
+    # cold cache: one lookup of the public server ids, then the insert
+    assert first.queries == 2
+
+    db = SignupSession()
+    response = await auth_service.register_user(signup(2), db)
+    assert db.queries == 1
+    assert db.commits == 1
+
+    sql = str(db.compiled(0))
+    assert sql.startswith("WITH new_user AS")
+    assert "INSERT INTO room_members" in sql and "FROM rooms JOIN new_user" in sql
+    assert "ON CONFLICT DO NOTHING" in sql
+
+    # column defaults are skipped in this form, so they must be bound values
+    assert "INSERT INTO room_members (room_id, user_id, role)" in sql
+    params = list(db.compiled(0).params.values())
+    assert RoomRole.member in params
+    assert None not in params
+
+    # the joined rooms are mirrored into the membership cache without another query
+    user_id = response["user"]["id"]
+    for room_id in PUBLIC_SERVERS:
+        assert await membership_service.redis_client.sismember(f"members:{room_id}", user_id)
+
+
+@pytest.mark.asyncio
+async def test_duplicate_username_or_email_is_rejected():
+    db = SignupSession(duplicate=True)
+    with pytest.raises(HTTPException) as exc:
+        await auth_service.register_user(signup(1), db)
+    assert exc.value.status_code == 400
+    assert db.rollbacks == 1
+    assert db.commits == 0
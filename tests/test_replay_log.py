@@ -0,0 +1,144 @@
+import asyncio
+import pytest
+from app.api.v1 import chat
+from app.websocket.manager import ConnectionManager
+from app.websocket.replay_log import ReplayLog
+from tests.fakes import FakeWebSocket, drain
+
+
+def message(n):
+    return {"type": "message", "content": f"msg {n}"}
+
+
+@pytest.mark.asyncio
+async def test_events_after_the_last_seen_one_are_replayed(redis):
+    log = ReplayLog(redis, maxlen=100)
+    events = [await log.append("room-1", message(n)) for n in range(5)]
+    await log.append("room-2", message(99))
+
+    assert events[0]["room_id"] == "room-1"
+    assert [e["event_id"] for e in events] == sorted(e["event_id"] for e in events)
+
+    replay = await log.since("room-1", events[1]["event_id"])
+    assert replay == events[2:]
+    assert await log.since("room-1", events[-1]["event_id"]) == []
+
+
+@pytest.mark.asyncio
+async def test_a_gap_past_the_retained_window_needs_a_resync(redis):
+    log = ReplayLog(redis, maxlen=10)
+    first = await log.append("room-1", message(0))
+    for n in range(1, 500):
+        last = await log.append("room-1", message(n))
+
+    # trimmed away, so the events right after it can't be vouched for
+    assert await log.since("room-1", first["event_id"]) is None
+    assert await log.since("room-1", "not-an-id") is None
+    assert await log.since("room-9", first["event_id"]) is None
+    assert log.resyncs == 3
+    assert await log.since("room-1", last["event_id"]) == []
+
+
+@pytest.mark.asyncio
+async def test_disabled_log_broadcasts_without_event_ids(redis):
+    log = ReplayLog(redis, maxlen=0)
+    assert await log.append("room-1", message(0)) == {**message(0), "room_id": "room-1"}
+    assert not await redis.exists("ws:replay:room-1")
+
+
+@pytest.mark.asyncio
+async def test_held_frames_follow_the_replay_without_duplicates():
+    manager = ConnectionManager()
+    ws = FakeWebSocket()
+    await manager.register(ws, "u1", "alice")
+    manager.subscribe(ws, "room-1", hold=True)
+    assert manager.holding == 1
+
+    # broadcast while the replay is being read: one event the replay also
+    # has, one newer, and nothing reaches the socket yet
+    await manager.broadcast_to_room({"type": "message", "event_id": "2-0"}, "room-1")
+    await manager.broadcast_to_room({"type": "message", "event_id": "3-0"}, "room-1")
+    await drain()
+    assert ws.sent == []
+
+    manager.release(ws, "room-1", [
+        {"type": "message", "room_id": "room-1", "event_id": "1-0"},
+        {"type": "message", "room_id": "room-1", "event_id": "2-0"},
+    ])
+    await drain()
+    assert [frame["event_id"] for frame in ws.sent] == ["1-0", "2-0", "3-0"]
+    assert manager.holding == 0
+
+    await manager.broadcast_to_room({"type": "message", "event_id": "4-0"}, "room-1")
+    await drain()
+    assert ws.sent[-1]["event_id"] == "4-0"
+    await manager.stop()
+
+
+@pytest.mark.asyncio
+async def test_disconnect_while_held_stops_holding():
+    manager = ConnectionManager()
+    ws = FakeWebSocket()
+    await manager.register(ws, "u1", "alice")
+    manager.subscribe(ws, "room-1", hold=True)
+    manager.subscribe(ws, "room-2", hold=True)
+    manager.unsubscribe(ws, "room-2")
+    assert manager.holding == 1
+    manager.disconnect(ws)
+    assert manager.holding == 0
+
+
+@pytest.mark.asyncio
+async def test_reconnecting_socket_gets_what_it_missed(redis, monkeypatch):
+    manager = ConnectionManager()
+    log = ReplayLog(redis, maxlen=100)
+    monkeypatch.setattr(chat, "manager", manager)
+    monkeypatch.setattr(chat, "replay_log", log)
+
+    seen = await log.append("room-1", message(0))
+    for n in range(1, 4):
+        await chat.broadcast_event(message(n), "room-1")
+
+    ws = FakeWebSocket()
+    await manager.register(ws, "u1", "alice")
+    manager.subscribe(ws, "room-1", hold=True)
+    await chat.resume_room(ws, "room-1", seen["event_id"])
+    await drain()
+    assert [frame["content"] for frame in ws.sent] == ["msg 1", "msg 2", "msg 3"]
+
+    # too far behind: told to reload history instead
+    stale = FakeWebSocket()
+    await manager.register(stale, "u2", "bob")
+    manager.subscribe(stale, "room-1", hold=True)
+    await chat.resume_room(stale, "room-1", "0-1")
+    await drain()
+    assert stale.sent == [{"type": "resync", "room_id": "room-1"}]
+    await manager.stop()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_events_go_out_in_event_id_order(redis, monkeypatch):
+    class SlowLog(ReplayLog):
+        # the earlier an event is appended, the longer it takes to come back
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.delays = [0.05, 0.04, 0.03, 0.02, 0.01]
+
+        async def append(self, room_id, message):
+            event = await super().append(room_id, message)
+            await asyncio.sleep(self.delays.pop(0))
+            return event
+
+    manager = ConnectionManager()
+    monkeypatch.setattr(chat, "manager", manager)
+    monkeypatch.setattr(chat, "replay_log", SlowLog(redis, maxlen=100))
+    ws = FakeWebSocket()
+    await manager.register(ws, "u1", "alice")
+    manager.subscribe(ws, "room-1")
+
+    await asyncio.gather(*(chat.broadcast_event(message(n), "room-1") for n in range(5)))
+    await drain()
+    event_ids = [frame["event_id"] for frame in ws.sent]
+    assert len(event_ids) == 5 and event_ids == sorted(event_ids)
+    assert chat._broadcast_locks == {}
+    await manager.stop()
@@ -30,4 +30,20 @@ async def test_join_room(client, auth_headers):
     headers2 = {"Authorization": f"Bearer {token}"}
 
     response = await client.post(f"/api/v1/rooms/{room_id}/join", headers=headers2)
-    assert response.status_code == 200
\ No newline at end of file
+    assert response.status_code == 200
+
+@pytest.mark.asyncio
+async def test_get_messages_paginated(client, auth_headers):
+    room = await client.post("/api/v1/rooms", json={
+        "name": "historyroom",
+        "description": "History test",
+        "is_private": False
+    }, headers=auth_headers)
+    room_id = room.json()["id"]
+
+    response = await client.get(f"/api/v1/rooms/{room_id}/messages?limit=10", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json() == {"messages": [], "next_cursor": None}
+
+    response = await client.get(f"/api/v1/rooms/{room_id}/messages?before=not-a-cursor", headers=auth_headers)
+    assert response.status_code == 400
@@ -0,0 +1,35 @@
+import uuid
+from datetime import datetime, timezone
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.dialects import postgresql
+from app.services import search_service
+
+
+def test_search_cursor_round_trips_the_exact_rank():
+    created_at = datetime.now(timezone.utc)
+    message_id = uuid.uuid4()
+    cursor = search_service.encode_search_cursor(0.1 + 0.2, created_at, message_id)
+    assert search_service.decode_search_cursor(cursor) == (0.1 + 0.2, created_at, message_id)
+
+    with pytest.raises(HTTPException) as exc:
+        search_service.decode_search_cursor("not-a-cursor")
+    assert exc.value.status_code == 400
+
+
+def test_highlight_is_escaped_before_marks_are_added():
+    headline = f"see {search_service.START}<script>{search_service.STOP} tag"
+    assert search_service.render_highlight(headline) == "see <mark>&lt;script&gt;</mark> tag"
+
+
+def test_search_is_scoped_to_the_users_rooms_and_paged_by_rank():
+    cursor = search_service.encode_search_cursor(0.5, datetime.now(timezone.utc), uuid.uuid4())
+    query = search_service.build_search_query(str(uuid.uuid4()), "deploy failed", 20, cursor=cursor)
+    sql = str(query.compile(dialect=postgresql.dialect()))
+
+    assert "JOIN room_members ON room_members.room_id = messages.room_id AND room_members.user_id" in sql
+    assert "messages.search_vector @@ websearch_to_tsquery" in sql
+    assert "messages.is_deleted = false" in sql
+    assert "(ts_rank_cd(messages.search_vector" in sql and "messages.created_at, messages.id) <" in sql
+    # the headline is only computed by the outer query, for one page of rows
+    assert sql.index("ts_headline") < sql.index("JOIN (SELECT")
@@ -0,0 +1,44 @@
+import asyncio
+import threading
+import pytest
+from fastapi import HTTPException
+from app.core.security import PasswordHasher, hash_password, verify_password
+
+
+@pytest.mark.asyncio
+async def test_hash_and_verify_password():
+    hashed = await hash_password("secret123")
+    assert await verify_password("secret123", hashed)
+    assert not await verify_password("wrong", hashed)
+
+
+@pytest.mark.asyncio
+async def test_hashing_does_not_block_the_event_loop():
+    hasher = PasswordHasher(workers=1, max_queue=0)
+    release = threading.Event()
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while not release.is_set():
+            ticks += 1
+            await asyncio.sleep(0.001)
+
+    job = asyncio.create_task(hasher.run(release.wait, 1))
+    tick_task = asyncio.create_task(ticker())
+    await asyncio.sleep(0.05)
+
+    # the worker is busy, but the loop keeps running other tasks
+    assert ticks > 5
+    assert hasher.pending == 1
+
+    # no room left in the queue: the next call is rejected instead of piling up
+    with pytest.raises(HTTPException) as exc:
+        await hasher.run(release.wait, 1)
+    assert exc.value.status_code == 503
+    assert hasher.rejected == 1
+
+    release.set()
+    await job
+    await tick_task
+    assert hasher.pending == 0
@@ -0,0 +1,82 @@
+import pytest
+from app.websocket import typing_state
+from app.websocket.typing_state import TypingCoalescer
+
+
+class Recorder:
+    def __init__(self):
+        self.frames = []
+
+    async def __call__(self, message: dict, room_id: str):
+        self.frames.append((room_id, message))
+
+    def typers(self, index: int = -1) -> list[str]:
+        return sorted(t["username"] for t in self.frames[index][1]["typers"])
+
+
+@pytest.fixture(autouse=True)
+def frozen_time(monkeypatch, clock):
+    monkeypatch.setattr(typing_state, "time", clock)
+
+
+@pytest.mark.asyncio
+async def test_keystrokes_are_coalesced_into_one_frame_per_room(clock):
+    sent = Recorder()
+    typing = TypingCoalescer(sent, ttl=5)
+
+    for _ in range(50):
+        await typing.update("room-1", "u1", "alice", True)
+        await typing.update("room-1", "u2", "bob", True)
+    await typing.flush()
+
+    assert typing.events == 100
+    assert len(sent.frames) == 1
+    assert sent.frames[0][0] == "room-1"
+    assert sent.frames[0][1]["type"] == "typing_state"
+    assert sent.typers() == ["alice", "bob"]
+
+    # more keystrokes from the same typers change nothing, so nothing is sent
+    await typing.update("room-1", "u1", "alice", True)
+    await typing.flush()
+    assert len(sent.frames) == 1
+
+    await typing.update("room-1", "u2", "bob", False)
+    await typing.flush()
+    assert sent.typers() == ["alice"]
+
+
+@pytest.mark.asyncio
+async def test_typers_expire_without_a_stop_event(clock):
+    sent = Recorder()
+    typing = TypingCoalescer(sent, ttl=5)
+    await typing.update("room-1", "u1", "alice", True)
+    await typing.flush()
+
+    clock.now += 4
+    await typing.update("room-1", "u1", "alice", True)
+    clock.now += 4
+    await typing.flush()
+    assert len(sent.frames) == 1
+
+    clock.now += 2
+    await typing.flush()
+    assert sent.typers() == []
+    assert typing.typers == {}
+
+
+@pytest.mark.asyncio
+async def test_workers_share_room_state_through_redis(clock, redis):
+    sent_a, sent_b = Recorder(), Recorder()
+    worker_a = TypingCoalescer(sent_a, redis=redis, ttl=5)
+    worker_b = TypingCoalescer(sent_b, redis=redis, ttl=5)
+
+    await worker_a.update("room-1", "u1", "alice", True)
+    await worker_a.flush()
+    await worker_b.update("room-1", "u2", "bob", True)
+    await worker_b.flush()
+    assert sent_a.typers() == ["alice"]
+    assert sent_b.typers() == ["alice", "bob"]
+
+    await worker_a.clear("room-1", "u1")
+    await worker_a.flush()
+    assert sent_a.typers() == ["bob"]
@@ -0,0 +1,95 @@
+import pytest
+import uuid
+from datetime import datetime, timezone
+from app.services import unread_service
+from app.services.message_writer import MessageWriter
+from app.tasks import watermarks
+from tests.fakes import FakeConnection, FakeSession
+
+ROOM, OTHER = str(uuid.uuid4()), str(uuid.uuid4())
+ALICE, BOB = str(uuid.uuid4()), str(uuid.uuid4())
+
+
+@pytest.fixture(autouse=True)
+def patch_redis(monkeypatch, redis, redis_sync):
+    monkeypatch.setattr(unread_service, "redis_client", redis)
+    monkeypatch.setattr(watermarks, "redis_sync", redis_sync)
+
+
+def memberships(room_ids, backlog=None):
+    # first query: the user's rooms; any later one: the Postgres backlog
+    return FakeSession([(room_id,) for room_id in room_ids], list((backlog or {}).items()))
+
+
+def rows(room_id, sender_id, n):
+    return [{"id": uuid.uuid4(), "room_id": room_id, "sender_id": sender_id, "content": "hi"} for _ in range(n)]
+
+
+@pytest.mark.asyncio
+async def test_counts_follow_persisted_batches_and_reads(redis):
+    # both members have read state already, so no backlog query is needed
+    await unread_service.mark_read(ALICE, ROOM)
+    await unread_service.mark_read(BOB, ROOM)
+
+    await unread_service.record_persisted(rows(ROOM, ALICE, 5))
+    await unread_service.record_persisted(rows(ROOM, ALICE, 2))
+
+    assert await unread_service.get_unread_counts(BOB, memberships([ROOM])) == {ROOM: 7}
+    # senders never see their own messages as unread
+    assert await unread_service.get_unread_counts(ALICE, memberships([ROOM])) == {ROOM: 0}
+
+    await unread_service.mark_read(BOB, ROOM)
+    assert await unread_service.get_unread_counts(BOB, memberships([ROOM])) == {ROOM: 0}
+
+
+@pytest.mark.asyncio
+async def test_missing_read_state_is_seeded_from_postgres_once(redis):
+    await unread_service.record_persisted(rows(ROOM, ALICE, 10))
+
+    db = memberships([ROOM, OTHER], backlog={ROOM: 3})
+    assert await unread_service.get_unread_counts(BOB, db) == {ROOM: 3, OTHER: 0}
+    assert db.queries == 2
+
+    # the seeded position is kept, so the next call is Redis only
+    await unread_service.record_persisted(rows(ROOM, ALICE, 1))
+    db = memberships([ROOM, OTHER])
+    assert await unread_service.get_unread_counts(BOB, db) == {ROOM: 4, OTHER: 0}
+    assert db.queries == 1
+
+
+@pytest.mark.asyncio
+async def test_writer_reports_committed_batches(redis):
+    writer = MessageWriter(
+        session_factory=FakeSession,
+        batch_size=10,
+        flush_interval=0.01,
+        on_persisted=[unread_service.record_persisted],
+    )
+    for row in rows(ROOM, ALICE, 12):
+        await writer.enqueue(row)
+    await writer.start()
+    await writer.stop()
+
+    assert await redis.hget(unread_service.SEQ_KEY, ROOM) == "12"
+
+
+@pytest.mark.asyncio
+async def test_watermarks_are_flushed_in_one_batch(redis, monkeypatch):
+    conn = FakeConnection()
+    monkeypatch.setattr(watermarks.sync_engine, "begin", lambda: conn)
+
+    for _ in range(5):
+        await unread_service.mark_read(BOB, ROOM)
+    await unread_service.mark_read(BOB, OTHER)
+    await unread_service.mark_read(ALICE, ROOM)
+
+    assert watermarks.flush_read_watermarks() == {"flushed": 3}
+    assert len(conn.executed) == 1
+    _, rows = conn.executed[0]
+    assert {(row["b_user_id"], row["b_room_id"]) for row in rows} == {
+        (uuid.UUID(BOB), uuid.UUID(ROOM)), (uuid.UUID(BOB), uuid.UUID(OTHER)), (uuid.UUID(ALICE), uuid.UUID(ROOM)),
+    }
+    assert all(row["b_read_at"] <= datetime.now(timezone.utc) for row in rows)
+
+    # drained until somebody reads again
+    assert watermarks.flush_read_watermarks() == {"flushed": 0}
@@ -0,0 +1,60 @@
+import pytest
+from app.core import user_cache
+from app.services import auth_service
+from app.core.security import create_access_token, create_refresh_token
+from app.core.user_cache import TTLCache
+from tests.fakes import FakeSession, FakeUser
+
+
+def test_ttl_cache_evicts_least_recently_used_and_expired(monkeypatch):
+    cache = TTLCache(maxsize=2, ttl=10)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+
+    now = user_cache.time.monotonic()
+    monkeypatch.setattr(user_cache.time, "monotonic", lambda: now + 11)
+    assert cache.get("a") is None
+
+
+def test_only_access_tokens_are_accepted():
+    assert user_cache.decode_access_token(create_refresh_token({"sub": "u1"})) is None
+    assert user_cache.decode_access_token("garbage") is None
+    token = create_access_token({"sub": "u1"})
+    assert user_cache.decode_access_token(token) == "u1"
+    assert user_cache.token_cache.get(token) == "u1"
+
+
+@pytest.mark.asyncio
+async def test_user_is_loaded_once_until_invalidated():
+    user = FakeUser()
+    db = FakeSession([user])
+    user_id = str(user.id)
+
+    first = await user_cache.load_user(user_id, lambda: db)
+    second = await user_cache.load_user(user_id, lambda: db)
+    assert first is second
+    assert db.queries == 1
+
+    user.is_active = False
+    user_cache.invalidate_user(user_id)
+    reloaded = await user_cache.load_user(user_id, lambda: db)
+    assert db.queries == 2
+    assert reloaded.is_active is False
+
+
+@pytest.mark.asyncio
+async def test_deactivation_takes_effect_on_this_worker_at_once():
+    user = FakeUser()
+    user_id = str(user.id)
+    await user_cache.load_user(user_id, lambda: FakeSession([user]))
+    assert user_cache.user_cache.get(user_id) is not None
+
+    db = FakeSession()
+    await auth_service.deactivate_user(user_id, db)
+    assert db.commits == 1
+    assert "is_active" in str(db.compiled())
+    assert user_cache.user_cache.get(user_id) is None
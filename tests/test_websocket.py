@@ -0,0 +1,223 @@
+import asyncio
+import pytest
+from app.api.v1 import chat
+from app.services import presence_service
+from app.websocket.manager import ConnectionManager
+from app.websocket.rate_limit import FrameLimiter
+from tests.fakes import FakeUser, FakeWebSocket, ScriptedWebSocket, drain, wait_until
+
+
+@pytest.mark.asyncio
+async def test_broadcast_reaches_sockets_on_other_workers(redis):
+    worker_a = ConnectionManager(redis=redis)
+    worker_b = ConnectionManager(redis=redis)
+    await worker_a.start()
+    await worker_b.start()
+
+    ws_a, ws_b, ws_other_room = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+    await worker_a.connect(ws_a, "room-1", "u1", "alice")
+    await worker_b.connect(ws_b, "room-1", "u2", "bob")
+    await worker_b.connect(ws_other_room, "room-2", "u3", "carol")
+
+    message = {"type": "message", "room_id": "room-1", "content": "hi"}
+    await worker_a.broadcast_to_room(message, "room-1")
+    await wait_until(lambda: ws_b.sent)
+    await asyncio.sleep(0.05)
+
+    # the sender's worker delivers once, not again when its own publish comes back
+    assert ws_a.sent == [message]
+    assert ws_b.sent == [message]
+    assert ws_other_room.sent == []
+
+    await worker_a.stop()
+    await worker_b.stop()
+
+
+class FlakyRedis:
+    # the first pub/sub connection drops as soon as it is read from
+    def __init__(self, redis):
+        self.redis = redis
+        self.failures = 1
+
+    def __getattr__(self, name):
+        return getattr(self.redis, name)
+
+    def pubsub(self):
+        pubsub = self.redis.pubsub()
+        if self.failures:
+            self.failures -= 1
+
+            async def listen():
+                raise ConnectionError("Connection reset by peer")
+                yield
+
+            pubsub.listen = listen
+        return pubsub
+
+
+@pytest.mark.asyncio
+async def test_listener_resubscribes_after_losing_its_connection(redis):
+    worker_a = ConnectionManager(redis=redis)
+    worker_b = ConnectionManager(redis=FlakyRedis(redis), reconnect_delay=0.01)
+    await worker_a.start()
+    await worker_b.start()
+    await wait_until(lambda: worker_b.listener_reconnects == 1)
+    assert worker_b.listener_connected
+
+    ws_b = FakeWebSocket()
+    await worker_b.connect(ws_b, "room-1", "u2", "bob")
+    await worker_a.broadcast_to_room({"type": "message", "room_id": "room-1"}, "room-1")
+    await wait_until(lambda: ws_b.sent)
+
+    await worker_a.stop()
+    await worker_b.stop()
+    assert not worker_b.listener_connected
+
+
+@pytest.mark.asyncio
+async def test_local_mode_does_not_publish():
+    manager = ConnectionManager()
+    await manager.start()
+    ws = FakeWebSocket()
+    await manager.connect(ws, "room-1", "u1", "alice")
+    await manager.broadcast_to_room({"type": "typing"}, "room-1")
+    await drain()
+    # frames are tagged with their room so multiplexed clients can route them
+    assert ws.sent == [{"type": "typing", "room_id": "room-1"}]
+    await manager.stop()
+
+
+@pytest.mark.asyncio
+async def test_stalled_socket_does_not_delay_others():
+    manager = ConnectionManager(send_queue_size=2)
+    fast, stalled = FakeWebSocket(), FakeWebSocket(stalled=True)
+    await manager.connect(fast, "room-1", "u1", "alice")
+    await manager.connect(stalled, "room-1", "u2", "bob")
+
+    for i in range(5):
+        await manager.broadcast_to_room({"n": i, "room_id": "room-1"}, "room-1")
+        await drain()
+
+    assert [frame["n"] for frame in fast.sent] == list(range(5))
+    # one frame is stuck in the stalled send, the queue keeps the newest two
+    assert manager.dropped_frames == 2
+    stalled.gate.set()
+    await drain()
+    assert [frame["n"] for frame in stalled.sent] == [0, 3, 4]
+    await manager.stop()
+
+
+@pytest.mark.asyncio
+async def test_overflow_disconnect_policy_closes_slow_consumer():
+    manager = ConnectionManager(send_queue_size=1, overflow_policy="disconnect")
+    fast, stalled = FakeWebSocket(), FakeWebSocket(stalled=True)
+    await manager.connect(fast, "room-1", "u1", "alice")
+    await manager.connect(stalled, "room-1", "u2", "bob")
+
+    for i in range(3):
+        await manager.broadcast_to_room({"n": i, "room_id": "room-1"}, "room-1")
+        await drain()
+
+    assert stalled.closed_with == 1008
+    assert manager.slow_consumer_disconnects == 1
+    assert manager.get_online_users("room-1") == [{"user_id": "u1", "username": "alice"}]
+    assert len(fast.sent) == 3
+    await manager.stop()
+
+
+@pytest.mark.asyncio
+async def test_heartbeat_pings_refreshes_and_reaps_silent_sockets():
+    refreshed = []
+
+    async def on_heartbeat(entries):
+        refreshed.append(entries)
+
+    manager = ConnectionManager(heartbeat_timeout=30, on_heartbeat=on_heartbeat)
+    alive, silent = FakeWebSocket(), FakeWebSocket()
+    await manager.connect(alive, "room-1", "u1", "alice")
+    await manager.connect(silent, "room-1", "u2", "bob")
+    manager.connections[silent].last_seen -= 60
+    manager.touch(alive)
+
+    await manager.heartbeat_tick()
+    await drain()
+
+    assert refreshed == [[("u1", "alice", "room-1")]]
+    assert alive.sent == [{"type": "ping"}]
+    assert silent.closed_with == 1001
+    assert manager.reaped_connections == 1
+    assert manager.get_online_users("room-1") == [{"user_id": "u1", "username": "alice"}]
+    await manager.stop()
+
+
+@pytest.mark.asyncio
+async def test_one_socket_can_follow_many_rooms():
+    manager = ConnectionManager()
+    ws, other = FakeWebSocket(), FakeWebSocket()
+    await manager.register(ws, "u1", "alice")
+    manager.subscribe(ws, "room-1")
+    manager.subscribe(ws, "room-2")
+    await manager.connect(other, "room-2", "u2", "bob")
+
+    await manager.broadcast_to_room({"type": "typing"}, "room-1")
+    await manager.broadcast_to_room({"type": "typing"}, "room-2")
+    await manager.heartbeat_tick()
+    await drain()
+    assert ws.sent == [
+        {"type": "typing", "room_id": "room-1"},
+        {"type": "typing", "room_id": "room-2"},
+        {"type": "ping"},
+    ]
+    assert len(other.sent) == 2
+
+    manager.unsubscribe(ws, "room-2")
+    await manager.broadcast_to_room({"type": "typing"}, "room-2")
+    await drain()
+    assert len(ws.sent) == 3
+    assert manager.get_online_users("room-2") == [{"user_id": "u2", "username": "bob"}]
+
+    manager.disconnect(ws)
+    assert manager.get_online_users("room-1") == []
+    await manager.stop()
+
+
+@pytest.mark.asyncio
+async def test_indexes_track_users_and_drop_empty_rooms():
+    manager = ConnectionManager()
+    tab_1, tab_2 = FakeWebSocket(), FakeWebSocket()
+    await manager.connect(tab_1, "room-1", "u1", "alice")
+    await manager.connect(tab_2, "room-2", "u1", "alice")
+
+    manager.send_to_user({"type": "notice"}, "u1")
+    await drain()
+    assert tab_1.sent == tab_2.sent == [{"type": "notice"}]
+
+    manager.disconnect(tab_1)
+    assert "room-1" not in manager.active_connections
+    assert list(manager.user_connections["u1"]) == [tab_2]
+
+    manager.disconnect(tab_2)
+    assert manager.active_connections == {}
+    assert manager.user_connections == {}
+    assert manager.connections == {}
+    await manager.stop()
+
+
+@pytest.mark.asyncio
+async def test_endpoint_cleans_up_after_any_error(monkeypatch, redis):
+    async def get_user(token):
+        return FakeUser("u1")
+
+    manager = ConnectionManager()
+    limiter = FrameLimiter(socket_limits={}, user_limits={})
+    monkeypatch.setattr(chat, "manager", manager)
+    monkeypatch.setattr(chat, "frame_limiter", limiter)
+    monkeypatch.setattr(chat, "get_user_from_token", get_user)
+    monkeypatch.setattr(presence_service, "redis_client", redis)
+
+    # a JSON array instead of an object blows up the frame dispatch
+    with pytest.raises(AttributeError):
+        await chat.multiplexed_endpoint(ScriptedWebSocket([["not", "an", "object"]]), token="t")
+
+    assert manager.connections == {} and manager.user_connections == {}
+    assert limiter.sockets == {} and limiter.users == {}